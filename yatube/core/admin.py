@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from . import tasks
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'priority', 'attempts', 'run_at')
+    list_filter = ('status', 'name')
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def retry(self, request, queryset):
+        self.message_user(
+            request, f'Возвращено в очередь: {tasks.retry(queryset)}')
+
+    retry.allowed_permissions = ('view',)
+    retry.short_description = 'Повторить задачи с ошибкой'
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,85 @@
+"""Бэкенды шаблонов и миниатюр, замеряющие свою работу для Server-Timing."""
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings, settings
+from sorl.thumbnail.helpers import serialize
+from sorl.thumbnail.images import ImageFile
+
+from . import instrumentation, thumbnails
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with instrumentation.timer('tpl'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Замеряет только рендеринг шаблона целиком: {% include %} и
+    {% extends %} разрешаются движком и не учитываются повторно.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Не создаёт миниатюры во время запроса.
+
+    Готовая миниатюра берётся из хранилища ключей sorl, а если её ещё нет,
+    создание ставится в фоновую очередь и шаблон получает оригинал.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with instrumentation.timer('thumb'):
+            if thumbnails.generating.get():
+                return super().get_thumbnail(
+                    file_, geometry_string, **options)
+            if not file_:
+                raise ValueError('falsey file_ argument in get_thumbnail()')
+            source = ImageFile(file_)
+            thumbnail = self.lookup(source, geometry_string, options)
+            if thumbnail is not None:
+                return thumbnail
+            thumbnails.schedule(source.name)
+            return source
+
+    def lookup(self, source, geometry_string, options):
+        """Готовая миниатюра из LRU процесса, хранилища ключей или None.
+
+        Имя миниатюры собирается так же, как в
+        sorl.thumbnail.base.ThumbnailBackend.get_thumbnail().
+        """
+        lru_key = (source.name, geometry_string, serialize(options))
+        thumbnail = thumbnails.lookups.get(lru_key)
+        if thumbnail is not None:
+            instrumentation.count('thumb_lru_hit')
+            return thumbnail
+        instrumentation.count('thumb_lru_miss')
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        thumbnail = default.kvstore.get(ImageFile(name, default.storage))
+        if thumbnail is not None:
+            thumbnails.lookups.set(lru_key, thumbnail)
+        return thumbnail
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        instrumentation.count('thumb_created')
+        return super()._create_thumbnail(
+            source_image, geometry_string, options, thumbnail)
@@ -0,0 +1,92 @@
+"""Замеры движков сессий: время ответа и обращения к django_session.
+
+Для каждого движка из ENGINES вошедший пользователь запрашивает
+страницу — обычно и с SESSION_SAVE_EVERY_REQUEST, — а затем входит
+заново. Результат — p50/p95 времени ответа и среднее число чтений и
+записей таблицы django_session на запрос.
+"""
+import statistics
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from . import testing
+
+User = get_user_model()
+
+ENGINES = ['django.contrib.sessions.backends.db', 'core.sessions']
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+PASSWORD = 'benchmark-password'
+
+
+class SessionSqlRecorder:
+    """Обёртка для connection.execute_wrapper: считает чтения и записи
+    таблицы сессий.
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+                self.writes += 1
+            else:
+                self.reads += 1
+        return execute(sql, params, many, context)
+
+
+def measure(request, reset, repeat):
+    timing, recorders, _ = testing.measure(
+        request, repeat, reset, SessionSqlRecorder)
+    return {
+        **timing,
+        'session_reads': round(
+            statistics.mean(recorder.reads for recorder in recorders), 2),
+        'session_writes': round(
+            statistics.mean(recorder.writes for recorder in recorders), 2),
+    }
+
+
+def run_engine(user, repeat):
+    client = Client()
+    login = {'username': user.username, 'password': PASSWORD}
+    client.post(reverse('users:login'), login)
+    page = reverse('posts:index')
+    results = {
+        'page': measure(lambda: client.get(page), None, repeat),
+    }
+    with override_settings(SESSION_SAVE_EVERY_REQUEST=True):
+        results['page_save_every_request'] = measure(
+            lambda: client.get(page), None, repeat)
+    results['login'] = measure(
+        lambda: client.post(reverse('users:login'), login),
+        lambda: client.get(reverse('users:logout')),
+        repeat,
+    )
+    return results
+
+
+# Замер касается сессий, а не стойкости хеша пароля.
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+])
+def run(engines=ENGINES, repeat=50, log=None):
+    """Прогоняет замеры для каждого движка сессий."""
+    user, _ = User.objects.get_or_create(username='session-benchmark')
+    user.set_password(PASSWORD)
+    user.save()
+    results = {}
+    for engine in engines:
+        cache.clear()
+        with override_settings(SESSION_ENGINE=engine):
+            results[engine] = run_engine(user, repeat)
+        if log:
+            for name, result in results[engine].items():
+                log(engine, name, result)
+    return results
@@ -0,0 +1,280 @@
+"""Бэкенды кеша, считающие попадания и промахи для Server-Timing."""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+
+from . import instrumentation
+
+MISSING = object()
+
+# INSERT ... ON CONFLICT DO UPDATE
+MIN_SQLITE_VERSION = (3, 24)
+# UPDATE ... RETURNING; на более старых версиях incr() читает значение
+# отдельным SELECT в той же транзакции
+RETURNING_SQLITE_VERSION = (3, 35)
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи get().
+
+    get_many() базового бэкенда вызывает get() для каждого ключа, поэтому
+    учитывается без отдельного переопределения.
+    """
+
+    def get(self, key, default=None, version=None):
+        with instrumentation.timer('cache'):
+            value = super().get(key, MISSING, version)
+        if value is MISSING:
+            instrumentation.count('cache_miss')
+            return default
+        instrumentation.count('cache_hit')
+        return value
+
+
+class LocMemCache(InstrumentedCacheMixin, BaseLocMemCache):
+    pass
+
+
+class BaseSQLiteCache(BaseCache):
+    """Кеш в файле SQLite в режиме WAL, общий для всех процессов хоста.
+
+    Целые числа хранятся как INTEGER, поэтому incr() — один атомарный
+    UPDATE. Остальные значения сериализуются pickle. При превышении
+    MAX_ENTRIES удаляются давно не читавшиеся ключи (LRU); время чтения
+    обновляется не чаще раза в ACCESS_RESOLUTION секунд, чтобы чтение
+    почти никогда не писало в базу. Размер проверяется раз в CULL_EVERY
+    записей. Нужен SQLite не старше MIN_SQLITE_VERSION.
+    """
+
+    def __init__(self, location, params):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise ImproperlyConfigured(
+                'SQLiteCache требует SQLite '
+                f'{".".join(map(str, MIN_SQLITE_VERSION))} или новее, '
+                f'установлена {sqlite3.sqlite_version}'
+            )
+        super().__init__(params)
+        version = sqlite3.sqlite_version_info
+        self._returning = version >= RETURNING_SQLITE_VERSION
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._access_resolution = options.get('ACCESS_RESOLUTION', 10)
+        self._cull_every = options.get('CULL_EVERY', 100)
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # Соединение SQLite нельзя переносить между процессами (fork).
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID'
+        )
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+        return connection
+
+    @contextmanager
+    def _write_transaction(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _written(self, count=1):
+        self._writes += count
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            connection.execute('DELETE FROM cache')
+            return
+        keep = self._max_entries - self._max_entries // self._cull_frequency
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count - keep,),
+        )
+
+    def _row(self, key, now):
+        row = self._connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        if now - row[2] > self._access_resolution:
+            self._connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return row
+
+    def get(self, key, default=None, version=None):
+        row = self._row(self._key(key, version), time.time())
+        if row is None:
+            return default
+        return self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join(['?'] * len(keys))
+        rows = self._connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            [*keys, now],
+        ).fetchall()
+        instrumentation.count('cache_hit', len(rows))
+        instrumentation.count('cache_miss', len(keys) - len(rows))
+        return {keys[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._connection.execute(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed',
+            (self._key(key, version), self._encode(value),
+             self.get_backend_timeout(timeout), time.time()),
+        )
+        self._written()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        cursor = self._connection.execute(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires <= ?',
+            (self._key(key, version), self._encode(value),
+             self.get_backend_timeout(timeout), now, now),
+        )
+        self._written()
+        return cursor.rowcount == 1
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with self._write_transaction() as connection:
+            connection.executemany(
+                'INSERT INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, expires = excluded.expires, '
+                'accessed = excluded.accessed',
+                [
+                    (self._key(key, version), self._encode(value),
+                     expires, now)
+                    for key, value in data.items()
+                ],
+            )
+        self._written(len(data))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        update = (
+            'UPDATE cache SET value = value + ? WHERE key = ? '
+            "AND typeof(value) = 'integer' "
+            'AND (expires IS NULL OR expires > ?)'
+        )
+        params = (delta, key, time.time())
+        if self._returning:
+            rows = self._connection.execute(
+                f'{update} RETURNING value', params).fetchall()
+        else:
+            with self._write_transaction() as connection:
+                rows = []
+                if connection.execute(update, params).rowcount:
+                    rows = connection.execute(
+                        'SELECT value FROM cache WHERE key = ?', (key,),
+                    ).fetchall()
+        if not rows:
+            raise ValueError(f"Key '{key}' not found")
+        return rows[0][0]
+
+    def has_key(self, key, version=None):
+        return self._row(self._key(key, version), time.time()) is not None
+
+    def delete(self, key, version=None):
+        cursor = self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),))
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ', '.join(['?'] * len(keys))
+            self._connection.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+
+class SQLiteCache(InstrumentedCacheMixin, BaseSQLiteCache):
+    pass
@@ -0,0 +1,60 @@
+"""Метрики текущего запроса: время и число операций по видам работы.
+
+Метрики собирает ServerTimingMiddleware. Вне запроса функции модуля
+ничего не делают, поэтому их можно вызывать из любого кода.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def as_dict(self):
+        return {
+            'durations_ms': {
+                name: round(duration * 1000, 3)
+                for name, duration in self.durations.items()
+            },
+            'counts': dict(self.counts),
+        }
+
+
+def start():
+    metrics = Metrics()
+    return metrics, _metrics.set(metrics)
+
+
+def stop(token):
+    _metrics.reset(token)
+
+
+def current():
+    return _metrics.get()
+
+
+def count(name, value=1):
+    metrics = _metrics.get()
+    if metrics is not None:
+        metrics.counts[name] += value
+
+
+@contextmanager
+def timer(name):
+    """Добавляет длительность блока и единицу к счётчику name."""
+    metrics = _metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += perf_counter() - started
+        metrics.counts[name] += 1
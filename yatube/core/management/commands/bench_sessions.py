@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+from core.testing import benchmark_environment, write_report
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает движки сессий: время ответа, чтения и записи таблицы '
+        'django_session на запрос. Работает на отдельной тестовой базе, '
+        'рабочие данные не затрагиваются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engines', default=','.join(benchmarks.ENGINES),
+            help='Движки SESSION_ENGINE через запятую',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', default='bench_sessions.json')
+
+    def handle(self, *args, **options):
+        engines = [item for item in options['engines'].split(',') if item]
+        with benchmark_environment():
+            results = benchmarks.run(
+                engines, repeat=options['repeat'], log=self.log)
+        write_report(options['output'], results, repeat=options['repeat'])
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+    def log(self, engine, name, result):
+        self.stdout.write(
+            f'{engine:<38} {name:<24} p50 {result["p50_ms"]:>8.2f} мс  '
+            f'p95 {result["p95_ms"]:>8.2f} мс  '
+            f'чтений {result["session_reads"]:>5}  '
+            f'записей {result["session_writes"]:>5}'
+        )
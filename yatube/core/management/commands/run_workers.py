@@ -0,0 +1,52 @@
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи очереди core.tasks в пуле процессов. Ctrl+C или '
+        'SIGTERM — остановиться после текущих задач'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASK_WORKERS,
+            help='Число процессов; 0 — в текущем процессе',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+
+    def handle(self, *args, **options):
+        tasks.enqueue_periodic()
+        if options['once'] or not options['processes']:
+            done = tasks.work(once=options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+            return
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        processes = options['processes']
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=tasks.init_worker,
+            initargs=(stop,),
+        ) as pool:
+            futures = [
+                pool.submit(tasks.run_worker) for _ in range(processes)]
+            self.stdout.write(f'Запущено воркеров: {processes}')
+            try:
+                wait(futures)
+            except KeyboardInterrupt:
+                stop.set()
+                wait(futures)
+        done = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
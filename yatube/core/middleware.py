@@ -0,0 +1,100 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import instrumentation
+
+logger = logging.getLogger('yatube.timing')
+
+# Метрики Server-Timing и их описания; значения заголовка — только ASCII.
+SERVER_TIMING_METRICS = {
+    'db': '{db} queries',
+    'tpl': 'templates',
+    'cache': '{cache_hit} hits, {cache_miss} misses',
+    'thumb': (
+        '{thumb_created} created, '
+        '{thumb_lru_hit} lru hits, {thumb_lru_miss} lru misses'
+    ),
+}
+
+
+def record_query(execute, sql, params, many, context):
+    with instrumentation.timer('db'):
+        return execute(sql, params, many, context)
+
+
+class ServerTimingMiddleware:
+    """Измеряет время SQL, шаблонов, кеша и миниатюр в каждом запросе.
+
+    Результат отдаётся в заголовке Server-Timing и пишется строкой в лог
+    yatube.timing: для каждого запроса с уровнем INFO, для медленных
+    (дольше SERVER_TIMING_LOG_THRESHOLD_MS) — с уровнем WARNING.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start()
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        total = perf_counter() - started
+        response['Server-Timing'] = self.header(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def header(self, metrics, total):
+        parts = []
+        for name, description in SERVER_TIMING_METRICS.items():
+            if name not in metrics.durations:
+                continue
+            description = description.format_map(metrics.counts)
+            parts.append(
+                f'{name};dur={metrics.durations[name] * 1000:.2f};'
+                f'desc="{description}"'
+            )
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+    def log(self, request, response, metrics, total):
+        timing = metrics.as_dict()
+        timing['total_ms'] = round(total * 1000, 3)
+        level = (
+            logging.WARNING
+            if timing['total_ms'] >= settings.SERVER_TIMING_LOG_THRESHOLD_MS
+            else logging.INFO
+        )
+        logger.log(
+            level,
+            'method=%s path=%s status=%s total_ms=%.2f db_ms=%.2f '
+            'db_queries=%d tpl_ms=%.2f cache_hits=%d cache_misses=%d '
+            'thumb_ms=%.2f thumb_created=%d thumb_lru_hits=%d '
+            'thumb_lru_misses=%d',
+            request.method, request.path, response.status_code,
+            timing['total_ms'],
+            timing['durations_ms'].get('db', 0), metrics.counts['db'],
+            timing['durations_ms'].get('tpl', 0),
+            metrics.counts['cache_hit'], metrics.counts['cache_miss'],
+            timing['durations_ms'].get('thumb', 0),
+            metrics.counts['thumb_created'],
+            metrics.counts['thumb_lru_hit'], metrics.counts['thumb_lru_miss'],
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'timing': timing,
+            },
+        )
@@ -0,0 +1,55 @@
+from django.db import models
+from django.db.models import Q
+
+
+class Task(models.Model):
+    """Задача очереди core.tasks."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    # JSON-список позиционных аргументов
+    args = models.TextField('Аргументы', default='[]')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    dedup_key = models.CharField(
+        'Ключ дедупликации', max_length=200, null=True, blank=True)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField('Выполнить после')
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Всего попыток')
+    # Время, на которое воркер занимает задачу (visibility timeout)
+    timeout = models.PositiveIntegerField('Таймаут, секунд')
+    locked_by = models.CharField('Занята', max_length=32, blank=True)
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    error = models.TextField('Ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'priority', 'run_at'],
+                name='core_task_ready',
+            ),
+        ]
+        constraints = [
+            # Одинаковая задача стоит в очереди один раз; выполняемая
+            # может быть поставлена снова.
+            models.UniqueConstraint(
+                name='core_task_unique_queued',
+                fields=['dedup_key'],
+                condition=Q(status='queued'),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,127 @@
+"""Сессии в базе с чтением через общий кеш (SESSION_ENGINE = 'core.sessions').
+
+Как и django.contrib.sessions.backends.cached_db, сессия читается из
+кеша, а в базу идёт только при промахе. Отличия:
+
+- в кеше хранится то же, что в базе — закодированные данные и срок
+  действия, поэтому save() видит, изменилась ли сессия, и неизменённую
+  не пишет ни в базу, ни в кеш, даже если её пометили modified;
+- срок действия неизменённой сессии продлевается в базе не чаще раза в
+  SESSION_EXPIRY_REFRESH_INTERVAL секунд (важно при
+  SESSION_SAVE_EVERY_REQUEST);
+- clear_expired() удаляет истёкшие строки частями, не занимая писателя
+  SQLite надолго. Команда clearsessions пользуется им же, а воркеры
+  очереди запускают очистку периодически (TASK_PERIODIC).
+
+Данные сессии, как и в остальных движках Django, загружаются лениво:
+запрос, который не обращается к сессии, не читает ни кеш, ни базу.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends import db
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from . import tasks
+
+KEY_PREFIX = 'core.sessions:'
+
+
+class SessionStore(db.SessionStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        # (закодированные данные, срок действия) — как записано в базе
+        self._stored = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def load(self):
+        try:
+            stored = self._cache.get(self.cache_key)
+        except Exception:
+            # Некорректный ключ из cookie: сессия начнётся заново.
+            stored = None
+        if stored is None or stored[1] <= timezone.now():
+            session = self._get_session_from_db()
+            if session is None:
+                return {}
+            stored = (session.session_data, session.expire_date)
+            self._cache.set(
+                self.cache_key, stored,
+                self.get_expiry_age(expiry=session.expire_date))
+        self._stored = stored
+        return self.decode(stored[0])
+
+    def exists(self, session_key):
+        return bool(session_key) and (
+            self.cache_key_prefix + session_key in self._cache
+            or super().exists(session_key)
+        )
+
+    def unchanged(self, session_data, expire_date):
+        """Данные те же, а срок действия продлевать ещё рано."""
+        if self._stored is None or self._stored[0] != session_data:
+            return False
+        refresh = timedelta(seconds=settings.SESSION_EXPIRY_REFRESH_INTERVAL)
+        return expire_date - self._stored[1] < refresh
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        session_data = self.encode(data)
+        expire_date = self.get_expiry_date()
+        if not must_create and self.unchanged(session_data, expire_date):
+            return
+        super().save(must_create)
+        self._stored = (session_data, expire_date)
+        self._cache.set(self.cache_key, self._stored, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        super().delete(session_key)
+        # cycle_key() удаляет прежний ключ уже после записи нового.
+        if session_key == self.session_key:
+            self._stored = None
+        self._cache.delete(self.cache_key_prefix + session_key)
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """Удаляет истёкшие сессии частями по batch_size строк, каждую
+        часть — в своей транзакции. Возвращает число удалённых.
+
+        Из кеша они уходят сами: срок жизни ключа равен сроку сессии.
+        """
+        model = cls.get_model_class()
+        batch_size = batch_size or settings.SESSION_CLEANUP_BATCH_SIZE
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                keys = list(model.objects.filter(
+                    expire_date__lt=timezone.now(),
+                ).values_list('session_key', flat=True)[:batch_size])
+                if not keys:
+                    return deleted
+                deleted += model.objects.filter(
+                    session_key__in=keys).delete()[0]
+
+
+@tasks.task(priority=tasks.LOW)
+def clear_expired():
+    """Периодическая задача очереди (TASK_PERIODIC)."""
+    return SessionStore.clear_expired()
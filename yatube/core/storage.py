@@ -0,0 +1,83 @@
+"""Хранилище, которое называет файлы по хешу содержимого."""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_name_re(directory):
+    """Шаблон имён, которые уже выданы хранилищем для каталога."""
+    shards = r'[0-9a-f]{2}/' * settings.MEDIA_SHARD_DEPTH
+    return rf'^{re.escape(directory)}/{shards}[0-9a-f]{{64}}(\.\w+)?$'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Имя файла — sha256 содержимого, разложенный по вложенным каталогам
+    внутри каталога upload_to: posts/ab/cd/abcd….jpg.
+
+    В одном каталоге остаётся не больше 256 записей на уровень, а
+    одинаковые загрузки хранятся один раз: повторное сохранение только
+    обновляет mtime файла. Сколько постов ссылается на файл, считает
+    posts.media.references().
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory, basename = posixpath.split(name)
+        stem, extension = posixpath.splitext(basename)
+        extension = extension.lower()
+        if re.fullmatch(r'[0-9a-f]{64}', stem):
+            # Новое содержимое для файла хранилища (например, уменьшенный
+            # оригинал): каталоги хеша не вкладываются повторно.
+            for _ in range(settings.MEDIA_SHARD_DEPTH):
+                directory = posixpath.dirname(directory)
+        shards = [
+            hexdigest[level * 2:level * 2 + 2]
+            for level in range(settings.MEDIA_SHARD_DEPTH)
+        ]
+        return posixpath.join(directory, *shards, hexdigest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Имена по содержимому не конфликтуют: одинаковое имя — тот же файл.
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        path = self.path(name)
+        if os.path.exists(path):
+            os.utime(path)
+            return name
+        directory = os.path.dirname(path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return name
+
+
+content_storage = ContentAddressedStorage()
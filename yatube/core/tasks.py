@@ -0,0 +1,276 @@
+"""Очередь задач в базе данных без отдельного брокера.
+
+Медленные побочные действия запроса — письма, миниатюры, фоновые задачи
+админки — ставятся в очередь строкой Task в той же транзакции, что и
+данные: откатилась транзакция — задачи нет, зафиксирована — её не
+потеряет перезапуск процесса. Выполняют задачи процессы
+manage.py run_workers.
+
+Воркер занимает задачу условным UPDATE на timeout секунд (visibility
+timeout): не успел или упал — задачу получит другой воркер. Задача,
+завершившаяся исключением, повторяется с экспоненциальной задержкой,
+пока не кончатся попытки, и остаётся в таблице со статусом «Ошибка».
+Выполненные задачи удаляются. Задачи с одинаковым dedup_key стоят в
+очереди один раз. Первыми выполняются задачи с большим приоритетом.
+Периодические задачи (TASK_PERIODIC) воркеры ставят при запуске и
+повторяют через заданный интервал.
+
+Функция задачи регистрируется декоратором @task и получает только
+позиционные аргументы, которые сериализуются в JSON.
+"""
+import importlib
+import json
+import logging
+import signal
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import (DatabaseError, IntegrityError, connections,
+                       transaction)
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HIGH = 10
+NORMAL = 0
+LOW = -10
+
+registry = {}
+
+_stop = None
+
+# Модели импортируются внутри функций: модуль загружают процессы пула
+# ещё до django.setup() (init_worker).
+
+
+def task(priority=NORMAL, max_attempts=None, timeout=None):
+    """Регистрирует функцию как задачу и добавляет ей метод
+    enqueue(*args, **options) с параметрами по умолчанию.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+        registry[name] = func
+        defaults = {
+            'priority': priority,
+            'max_attempts': max_attempts,
+            'timeout': timeout,
+        }
+
+        def enqueue_func(*args, **options):
+            return enqueue(name, args, **{**defaults, **options})
+
+        func.task_name = name
+        func.enqueue = enqueue_func
+        return func
+    return decorator
+
+
+def resolve(name):
+    if name not in registry:
+        # Задачи регистрируются при импорте своего модуля.
+        importlib.import_module(name.rsplit('.', 1)[0])
+    return registry[name]
+
+
+def enqueue(name, args=(), priority=NORMAL, dedup_key=None, delay=0,
+            max_attempts=None, timeout=None):
+    """Ставит задачу в очередь. Если задача с тем же dedup_key уже ждёт,
+    новая не создаётся, а приоритет ожидающей поднимается при
+    необходимости. Возвращает Task (None в режиме TASKS_EAGER).
+    """
+    from .models import Task
+
+    args = list(args)
+    if settings.TASKS_EAGER:
+        transaction.on_commit(lambda: resolve(name)(*args))
+        return None
+    task = Task(
+        name=name,
+        args=json.dumps(args),
+        priority=priority,
+        dedup_key=dedup_key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        timeout=timeout or settings.TASK_TIMEOUT,
+    )
+    if dedup_key is None:
+        task.save()
+        return task
+    Task.objects.bulk_create([task], ignore_conflicts=True)
+    queued = Task.objects.filter(dedup_key=dedup_key, status=Task.QUEUED)
+    queued.filter(priority__lt=priority).update(priority=priority)
+    return queued.first()
+
+
+def enqueue_periodic():
+    """Ставит периодические задачи из TASK_PERIODIC, если их ещё нет в
+    очереди. После выполнения такая задача ставится снова через свой
+    интервал.
+    """
+    for name in settings.TASK_PERIODIC:
+        enqueue(name, priority=LOW, dedup_key=f'periodic:{name}')
+
+
+def reschedule(task):
+    interval = settings.TASK_PERIODIC.get(task.name)
+    if interval is not None:
+        enqueue(
+            task.name, json.loads(task.args), priority=task.priority,
+            dedup_key=task.dedup_key, delay=interval)
+
+
+def ready():
+    """Задачи, которые можно взять: ждущие своего времени и брошенные
+    воркерами, у которых остались попытки.
+    """
+    from .models import Task
+
+    now = timezone.now()
+    return Task.objects.filter(
+        Q(status=Task.QUEUED, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now),
+        attempts__lt=F('max_attempts'),
+    )
+
+
+def claim():
+    """Занимает следующую задачу или возвращает None.
+
+    Выбор и захват — отдельные запросы, поэтому захват повторяет условия
+    выбора: если задачу успел взять другой воркер, берётся следующая.
+    """
+    from .models import Task
+
+    while True:
+        candidate = ready().order_by(
+            '-priority', 'run_at', 'pk').values_list('pk', 'timeout').first()
+        if candidate is None:
+            return None
+        pk, timeout = candidate
+        token = uuid.uuid4().hex
+        claimed = ready().filter(pk=pk).update(
+            status=Task.RUNNING,
+            locked_by=token,
+            locked_until=timezone.now() + timedelta(seconds=timeout),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+
+
+def expire():
+    """Брошенные задачи без оставшихся попыток помечаются ошибкой."""
+    from .models import Task
+
+    return Task.objects.filter(
+        status=Task.RUNNING,
+        locked_until__lt=timezone.now(),
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Task.FAILED, locked_until=None,
+        error='Воркер не завершил задачу за отведённое время')
+
+
+def execute(task):
+    """Выполняет занятую задачу. True, если она выполнена."""
+    from .models import Task
+
+    mine = Task.objects.filter(pk=task.pk, locked_by=task.locked_by)
+    try:
+        resolve(task.name)(*json.loads(task.args))
+    except Exception:
+        logger.exception(
+            'Задача %s (%s) завершилась ошибкой, попытка %s из %s',
+            task.pk, task.name, task.attempts, task.max_attempts)
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            mine.update(
+                status=Task.FAILED, locked_until=None, error=error)
+            reschedule(task)
+            return False
+        delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+        try:
+            with transaction.atomic():
+                mine.update(
+                    status=Task.QUEUED, locked_until=None, error=error,
+                    run_at=timezone.now() + timedelta(seconds=delay))
+        except IntegrityError:
+            # Такая же задача уже снова в очереди.
+            mine.delete()
+        return False
+    if mine.delete()[0]:
+        reschedule(task)
+    return True
+
+
+def retry(queryset):
+    """Возвращает задачи с ошибкой в очередь с новым запасом попыток."""
+    from .models import Task
+
+    retried = 0
+    for task in queryset.filter(status=Task.FAILED):
+        try:
+            with transaction.atomic():
+                retried += Task.objects.filter(pk=task.pk).update(
+                    status=Task.QUEUED, attempts=0, error='',
+                    locked_until=None, run_at=timezone.now())
+        except IntegrityError:
+            task.delete()
+    return retried
+
+
+def work(once=False):
+    """Цикл воркера: выполняет задачи до остановки, с once=True — пока
+    очередь не опустеет. Возвращает число выполненных задач.
+    """
+    done = 0
+    while _stop is None or not _stop.is_set():
+        try:
+            task = claim()
+            if task is None:
+                expire()
+                if once:
+                    break
+                pause()
+                continue
+            if execute(task):
+                done += 1
+        except DatabaseError:
+            # База заблокирована или соединение оборвалось: воркер не
+            # падает, а переоткрывает соединение после паузы. Занятая
+            # задача вернётся в очередь по истечении TASK_TIMEOUT.
+            logger.exception('Ошибка базы в цикле воркера')
+            connections.close_all()
+            pause()
+    return done
+
+
+def pause():
+    if _stop is not None:
+        _stop.wait(settings.TASK_POLL_INTERVAL)
+    else:
+        time.sleep(settings.TASK_POLL_INTERVAL)
+
+
+def init_worker(stop):
+    """Процесс пула. Ctrl+C обрабатывает главный процесс, SIGTERM может
+    прийти всей группе процессов: в обоих случаях воркер завершает
+    текущую задачу и выходит.
+    """
+    global _stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    _stop = stop
+    django.setup()
+
+
+def run_worker():
+    try:
+        return work()
+    finally:
+        connections.close_all()
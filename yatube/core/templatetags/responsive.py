@@ -0,0 +1,57 @@
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+from sorl.thumbnail.shortcuts import get_thumbnail
+
+from core import thumbnails
+
+register = template.Library()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+
+def srcset(images):
+    return format_html_join(
+        ', ', '{} {}w',
+        ((thumbnail.url, variant.width) for variant, thumbnail in images),
+    )
+
+
+@register.simple_tag
+def responsive_image(image, css_class='', width=None, height=None):
+    """<picture> с вариантами картинки разной ширины и формата.
+
+    Размеры вариантов известны заранее, поэтому браузер резервирует место
+    под картинку до её загрузки. Пока варианты не созданы, выводится
+    оригинал с сохранёнными в базе размерами width и height.
+    """
+    if not image:
+        return ''
+    by_format = {}
+    for variant in thumbnails.variants():
+        thumbnail = get_thumbnail(image, variant.geometry, **variant.options)
+        if thumbnail.name == image.name:
+            if width and height:
+                return format_html(
+                    '<img class="{}" src="{}" width="{}" height="{}" '
+                    'loading="lazy" alt="">',
+                    css_class, image.url, width, height)
+            return format_html(
+                '<img class="{}" src="{}" loading="lazy" alt="">',
+                css_class, image.url)
+        by_format.setdefault(variant.format, []).append((variant, thumbnail))
+    *preferred, fallback = by_format
+    sizes = settings.THUMBNAIL_RESPONSIVE_SIZES
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[image_format], srcset(by_format[image_format]), sizes)
+         for image_format in preferred),
+    )
+    variant, thumbnail = max(
+        by_format[fallback], key=lambda item: item[0].width)
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="lazy" alt=""></picture>',
+        sources, css_class, thumbnail.url, srcset(by_format[fallback]),
+        sizes, variant.width, variant.height,
+    )
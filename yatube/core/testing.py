@@ -0,0 +1,156 @@
+"""Окружение тестов и замеров, отделённое от рабочего, и общие части
+замеров (core.benchmarks, posts.benchmarks).
+
+Кеш SQLiteCache — общий файл хоста: тесты и замеры очищают его и пишут
+в него счётчики и версии тестовой базы. Здесь такие кеши подменяются
+временными файлами на время прогона.
+"""
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.runner import DiscoverRunner as BaseDiscoverRunner
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+from django.utils import timezone
+
+SQLITE_CACHE = 'core.cache.SQLiteCache'
+TIMING_LOGGER = logging.getLogger('yatube.timing')
+
+
+@contextmanager
+def temporary_caches():
+    """Кеши SQLiteCache пишут во временные файлы, удаляемые на выходе."""
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {
+        alias: (
+            {**params, 'LOCATION': os.path.join(directory, f'{alias}.sqlite3')}
+            if params['BACKEND'] == SQLITE_CACHE else params
+        )
+        for alias, params in settings.CACHES.items()
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def quiet_timing_log():
+    """Строки лога yatube.timing об обычных запросах в выводе тестов и
+    замеров не нужны: остаются только медленные (WARNING).
+    """
+    level = TIMING_LOGGER.level
+    TIMING_LOGGER.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        TIMING_LOGGER.setLevel(level)
+
+
+@contextmanager
+def isolated_environment():
+    with temporary_caches(), quiet_timing_log():
+        yield
+
+
+class DiscoverRunner(BaseDiscoverRunner):
+    """Запускает manage.py test со временными кешами и без строк лога
+    обычных запросов (TEST_RUNNER).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._environment = isolated_environment()
+        self._environment.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._environment.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
+
+
+@contextmanager
+def benchmark_environment():
+    """Замеры идут на отдельной тестовой базе и временных кешах: рабочие
+    данные не затрагиваются.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with isolated_environment():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def write_report(path, results, comparison=None, sections=None, **meta):
+    """Пишет результаты замеров в JSON вместе с версиями окружения;
+    sections — дополнительные разделы отчёта.
+    """
+    report = {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            **meta,
+        },
+        'results': results,
+        **(sections or {}),
+    }
+    if comparison is not None:
+        report['comparison'] = comparison
+    Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def measure(request, repeat, reset=None, recorder=None):
+    """Замеряет repeat вызовов request().
+
+    Первый вызов прогревает кеши и не учитывается; reset() вызывается
+    перед каждым вызовом вне замера. recorder — класс обёртки для
+    connection.execute_wrapper, на каждый вызов создаётся новая.
+    Возвращает p50/p95 времени в мс, обёртки и результат последнего
+    вызова.
+    """
+    timings, recorders = [], []
+    result = request()
+    for _ in range(repeat):
+        if reset:
+            reset()
+        wrapper = recorder() if recorder else passthrough
+        with connection.execute_wrapper(wrapper):
+            start = time.perf_counter()
+            result = request()
+            timings.append(time.perf_counter() - start)
+        recorders.append(wrapper)
+    timing = {
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+    }
+    return timing, recorders, result
+
+
+def passthrough(execute, sql, params, many, context):
+    return execute(sql, params, many, context)
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+from ..testing import temporary_caches
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_add_delete(self):
+        """Базовые операции кеша"""
+        self.cache.set('text', {'title': 'Заголовок'})
+        self.assertEqual(self.cache.get('text'), {'title': 'Заголовок'})
+        self.assertFalse(self.cache.add('text', 'другое значение'))
+        self.assertTrue(self.cache.add('new', 1))
+        self.assertEqual(
+            self.cache.get_many(['text', 'new', 'missing']),
+            {'text': {'title': 'Заголовок'}, 'new': 1},
+        )
+        self.assertTrue(self.cache.delete('text'))
+        self.assertIsNone(self.cache.get('text'))
+        self.assertEqual(self.cache.get('text', 'default'), 'default')
+
+    def test_expired_keys_are_missing(self):
+        """Истёкшие ключи не читаются и могут быть добавлены заново"""
+        self.cache.set('short', 'значение', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertNotIn('short', self.cache)
+        self.assertTrue(self.cache.add('short', 'новое'))
+        self.assertEqual(self.cache.get('short'), 'новое')
+
+    def test_incr(self):
+        """incr и decr меняют число, отсутствующий ключ — ошибка"""
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter', 5), 15)
+        self.assertEqual(self.cache.decr('counter'), 14)
+        self.assertEqual(self.cache.get('counter'), 14)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_without_returning(self):
+        """На SQLite без RETURNING incr читает значение в той же транзакции"""
+        self.cache._returning = False
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter', 5), 15)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    @mock.patch('sqlite3.sqlite_version_info', (3, 23, 0))
+    def test_old_sqlite_is_rejected(self):
+        """На SQLite без ON CONFLICT DO UPDATE кеш не создаётся"""
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_cache()
+
+    def test_least_recently_used_keys_are_evicted(self):
+        """При переполнении удаляются давно не читавшиеся ключи"""
+        cache = self.make_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_EVERY=1,
+            ACCESS_RESOLUTION=0,
+        )
+        cache.set('popular', 'часто читаемый')
+        for i in range(20):
+            cache.set(f'key-{i}', i)
+            cache.get('popular')
+        self.assertEqual(cache.get('popular'), 'часто читаемый')
+        self.assertIsNone(cache.get('key-0'))
+        self.assertEqual(cache.get('key-19'), 19)
+
+    def test_shared_between_processes(self):
+        """Процессы видят одни данные, incr атомарен между процессами"""
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise unittest.SkipTest('fork недоступен')
+        self.cache.set('counter', 0)
+        workers = [
+            context.Process(target=increment, args=(self.location, 100))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+
+
+class TemporaryCachesTest(SimpleTestCase):
+    def test_tests_do_not_touch_shared_cache(self):
+        """Тесты и замеры пишут во временный файл, а не в общий кеш"""
+        shared = os.path.join(settings.BASE_DIR, 'cache.sqlite3')
+        self.assertNotEqual(cache._path, shared)
+        with temporary_caches():
+            location = cache._path
+            cache.set('key', 'значение')
+            self.assertNotEqual(location, shared)
+        self.assertFalse(os.path.exists(location))
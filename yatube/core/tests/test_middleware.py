@@ -0,0 +1,57 @@
+import re
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Timer')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def metrics(self, response):
+        return {
+            metric.split(';')[0]: metric
+            for metric in re.split(
+                r', (?=[\w-]+;)', response['Server-Timing'])
+        }
+
+    def test_header_reports_db_templates_and_cache(self):
+        """Server-Timing содержит время SQL, шаблонов, кеша и общее"""
+        response = self.client.get(reverse('posts:index'))
+        metrics = self.metrics(response)
+        self.assertRegex(metrics['db'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+        self.assertIn('tpl', metrics)
+        self.assertRegex(
+            metrics['cache'], r'desc="\d+ hits, [1-9]\d* misses"')
+        self.assertRegex(metrics['total'], r'^total;dur=[\d.]+$')
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertRegex(
+            self.metrics(response)['cache'], r'desc="[1-9]\d* hits')
+
+    def test_every_request_is_logged(self):
+        """Каждый запрос пишется в лог строкой с метриками"""
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = logs.records[0]
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(record.path, reverse('posts:index'))
+        self.assertEqual(record.status, 200)
+        self.assertIn('db', record.timing['durations_ms'])
+        self.assertIn('db_queries=', record.getMessage())
+
+    @override_settings(SERVER_TIMING_LOG_THRESHOLD_MS=0)
+    def test_slow_requests_are_warnings(self):
+        """Запрос дольше порога пишется с уровнем WARNING"""
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
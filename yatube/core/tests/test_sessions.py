@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import benchmarks, tasks
+from ..models import Task
+from ..sessions import SessionStore
+
+User = get_user_model()
+
+
+def session_queries(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if 'django_session' in query['sql']
+    ]
+
+
+@override_settings(SESSION_ENGINE='core.sessions')
+class CachedSessionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = SessionStore()
+        self.store['value'] = 1
+        self.store.save()
+
+    def test_read_through_cache(self):
+        """Сохранённая сессия читается из кеша, а без него — из базы"""
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(SessionStore(self.store.session_key)['value'], 1)
+        self.assertEqual(session_queries(context), [])
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(SessionStore(self.store.session_key)['value'], 1)
+        self.assertEqual(len(session_queries(context)), 1)
+
+    def test_unchanged_session_is_not_written(self):
+        """Сессия, помеченная изменённой без изменений, не пишется"""
+        store = SessionStore(self.store.session_key)
+        store['value'] = 1
+        with CaptureQueriesContext(connection) as context:
+            store.save()
+        self.assertEqual(session_queries(context), [])
+
+    def test_changed_session_is_written(self):
+        """Изменённая сессия пишется в базу и в кеш"""
+        store = SessionStore(self.store.session_key)
+        store['value'] = 2
+        store.save()
+        self.assertEqual(SessionStore(self.store.session_key)['value'], 2)
+        cache.clear()
+        self.assertEqual(SessionStore(self.store.session_key)['value'], 2)
+
+    @override_settings(SESSION_EXPIRY_REFRESH_INTERVAL=0)
+    def test_expiry_is_refreshed(self):
+        """Срок действия продлевается раз в заданный интервал"""
+        store = SessionStore(self.store.session_key)
+        store['value']
+        with CaptureQueriesContext(connection) as context:
+            store.save()
+        self.assertEqual(len(session_queries(context)), 1)
+
+    def test_login_and_logout(self):
+        """Вход и выход работают, выход удаляет сессию из кеша"""
+        user = User.objects.create_user(username='user', password='password')
+        self.client.login(username='user', password='password')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['user'], user)
+        key = self.client.session.session_key
+        self.client.get(reverse('users:logout'))
+        self.assertFalse(SessionStore().exists(key))
+
+    def test_clear_expired_in_batches(self):
+        """Истёкшие сессии удаляются частями, действующие остаются"""
+        Session.objects.bulk_create([
+            Session(
+                session_key=f'expired{i}', session_data='',
+                expire_date=timezone.now() - timedelta(days=1))
+            for i in range(5)
+        ])
+        self.assertEqual(SessionStore.clear_expired(batch_size=2), 5)
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            [self.store.session_key])
+
+    @override_settings(TASKS_EAGER=False)
+    def test_periodic_cleanup(self):
+        """Очистка — периодическая задача очереди"""
+        Session.objects.create(
+            session_key='expired', session_data='',
+            expire_date=timezone.now() - timedelta(days=1))
+        tasks.enqueue_periodic()
+        tasks.work(once=True)
+        self.assertFalse(Session.objects.filter(
+            session_key='expired').exists())
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'core.sessions.clear_expired')
+        self.assertGreater(task.run_at, timezone.now())
+
+
+class SessionBenchmarksTest(TestCase):
+    def test_cache_engine_avoids_session_table(self):
+        """Замеры сравнивают движки по обращениям к django_session"""
+        results = benchmarks.run(repeat=2)
+        db = results['django.contrib.sessions.backends.db']
+        cached = results['core.sessions']
+        self.assertEqual(db['page']['session_reads'], 1)
+        self.assertEqual(cached['page']['session_reads'], 0)
+        self.assertEqual(db['page_save_every_request']['session_writes'], 1)
+        self.assertEqual(
+            cached['page_save_every_request']['session_writes'], 0)
+        self.assertGreater(cached['login']['session_writes'], 0)
@@ -0,0 +1,146 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import tasks
+from ..models import Task
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task()
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=3)
+def broken(value):
+    calls.append(value)
+    raise RuntimeError(value)
+
+
+@override_settings(TASKS_EAGER=False, TASK_RETRY_DELAY=0, TASK_PERIODIC={})
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_work(self):
+        """Задача выполняется воркером и удаляется из таблицы"""
+        task = record.enqueue('значение')
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(tasks.work(once=True), 1)
+        self.assertEqual(calls, ['значение'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_worker_survives_database_errors(self):
+        """Ошибка базы не останавливает воркер: он переоткрывает
+        соединение, ждёт и продолжает
+        """
+        record.enqueue('значение')
+        claim = tasks.claim
+        failures = [OperationalError('database is locked')]
+
+        def flaky_claim():
+            if failures:
+                raise failures.pop()
+            return claim()
+
+        with mock.patch.object(tasks, 'claim', flaky_claim), \
+                mock.patch.object(tasks.connections, 'close_all') as close, \
+                mock.patch.object(tasks.time, 'sleep') as sleep, \
+                self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.work(once=True), 1)
+        close.assert_called_once_with()
+        sleep.assert_called_once_with(settings.TASK_POLL_INTERVAL)
+        self.assertEqual(calls, ['значение'])
+
+    def test_priority_and_delay(self):
+        """Сначала задачи с большим приоритетом, отложенные — в свой срок"""
+        record.enqueue('обычная')
+        record.enqueue('срочная', priority=tasks.HIGH)
+        record.enqueue('отложенная', delay=60)
+        tasks.work(once=True)
+        self.assertEqual(calls, ['срочная', 'обычная'])
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+
+    def test_dedup_key(self):
+        """Задача с тем же ключом стоит в очереди один раз"""
+        first = record.enqueue('а', dedup_key='key')
+        second = record.enqueue('а', dedup_key='key', priority=tasks.HIGH)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.get().priority, tasks.HIGH)
+        tasks.claim()
+        # Выполняемую задачу можно поставить снова.
+        record.enqueue('а', dedup_key='key')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_retries_until_attempts_exhausted(self):
+        """Упавшая задача повторяется, затем остаётся с ошибкой"""
+        with self.assertLogs('core.tasks', 'ERROR'):
+            broken.enqueue('сбой')
+            tasks.work(once=True)
+        self.assertEqual(calls, ['сбой'] * 3)
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 3))
+        self.assertIn('RuntimeError', task.error)
+        self.assertEqual(tasks.retry(Task.objects.all()), 1)
+        self.assertEqual(Task.objects.get().attempts, 0)
+
+    def test_visibility_timeout(self):
+        """Задачу, которую воркер не завершил вовремя, получает другой"""
+        record.enqueue('а')
+        task = tasks.claim()
+        self.assertIsNone(tasks.claim())
+        Task.objects.filter(pk=task.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        again = tasks.claim()
+        self.assertEqual((again.pk, again.attempts), (task.pk, 2))
+        # Прежний воркер уже не может завершить задачу.
+        tasks.execute(task)
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+
+    def test_expired_task_without_attempts_fails(self):
+        """Брошенная задача без попыток помечается ошибкой"""
+        record.enqueue('а', max_attempts=1)
+        task = tasks.claim()
+        Task.objects.filter(pk=task.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        tasks.work(once=True)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertEqual(calls, [])
+
+    def test_run_workers_command(self):
+        """run_workers --once выполняет готовые задачи"""
+        record.enqueue('а')
+        record.enqueue('б')
+        out = StringIO()
+        call_command('run_workers', once=True, stdout=out)
+        self.assertIn('Выполнено задач: 2', out.getvalue())
+        self.assertEqual(sorted(calls), ['а', 'б'])
+
+    def test_password_reset_email_is_queued(self):
+        """Письмо сброса пароля отправляет воркер, а не запрос"""
+        User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        response = self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'user@example.com'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            Task.objects.get().name, 'users.tasks.send_email')
+        tasks.work(once=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
@@ -0,0 +1,196 @@
+"""Фоновое создание миниатюр задачами очереди core.tasks.
+
+Задача ставится в той же транзакции, которая сохранила картинку;
+воркер уменьшает оригинал больше IMAGE_MAX_SIDE, создаёт все
+миниатюры из geometries() — адаптивные варианты и THUMBNAIL_GEOMETRIES —
+и отправляет сигнал thumbnails_generated. Пока миниатюр нет, бэкенд
+(core.backends.ThumbnailBackend) отдаёт шаблонам оригинал.
+"""
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict, namedtuple
+from contextvars import ContextVar
+from time import monotonic
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
+from django.dispatch import Signal
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from . import tasks
+from .storage import content_storage
+
+thumbnails_generated = Signal(providing_args=['name', 'original'])
+
+FAILED_KEY_PREFIX = 'thumbnails:failed'
+FAILED_TIMEOUT = 60 * 60
+SCHEDULED_KEY_PREFIX = 'thumbnails:scheduled'
+
+# Внутри воркера бэкенд создаёт миниатюры сам, а не ставит их в очередь.
+generating = ContextVar('thumbnails_generating', default=False)
+
+Variant = namedtuple('Variant', 'width height format geometry options')
+
+
+class LookupCache:
+    """Готовые миниатюры в памяти процесса: LRU ограниченного размера.
+
+    Ключ — (имя исходника, геометрия, опции). Хранятся только найденные
+    миниатюры; записи живут THUMBNAIL_LRU_TIMEOUT секунд, чтобы удаление
+    миниатюр в другом процессе не оставляло здесь битых ссылок надолго.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._by_source = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            thumbnail, expires = entry
+            if expires <= monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return thumbnail
+
+    def set(self, key, thumbnail):
+        with self._lock:
+            self._entries[key] = (
+                thumbnail, monotonic() + settings.THUMBNAIL_LRU_TIMEOUT)
+            self._entries.move_to_end(key)
+            self._by_source[key[0]].add(key)
+            while len(self._entries) > settings.THUMBNAIL_LRU_SIZE:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, name):
+        with self._lock:
+            for key in self._by_source.pop(name, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_source.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_source.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_source[key[0]]
+
+
+lookups = LookupCache()
+
+
+def formats():
+    """Форматы из THUMBNAIL_RESPONSIVE_FORMATS, которые умеет Pillow."""
+    Image.init()
+    supported = [
+        image_format for image_format in settings.THUMBNAIL_RESPONSIVE_FORMATS
+        if image_format in Image.SAVE
+    ]
+    return supported or ['JPEG']
+
+
+def variants():
+    """Адаптивные варианты картинки: каждая ширина в каждом формате."""
+    ratio_width, ratio_height = settings.THUMBNAIL_RESPONSIVE_RATIO
+    result = []
+    for image_format in formats():
+        for width in settings.THUMBNAIL_RESPONSIVE_WIDTHS:
+            height = round(width * ratio_height / ratio_width)
+            result.append(Variant(
+                width, height, image_format, f'{width}x{height}',
+                {'crop': 'center', 'upscale': True, 'format': image_format},
+            ))
+    return result
+
+
+def geometries():
+    return [
+        (variant.geometry, variant.options) for variant in variants()
+    ] + list(settings.THUMBNAIL_GEOMETRIES)
+
+
+def init_worker():
+    django.setup()
+
+
+def downscale(name):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE по большей стороне.
+
+    Image.thumbnail() декодирует JPEG сразу в уменьшенном масштабе
+    (Image.draft), так что память воркера зависит от результата, а не от
+    исходника. Уменьшенная картинка сохраняется в хранилище под хешем
+    своего содержимого, оригинал не меняется. Анимации не трогаются.
+    Возвращает имя уменьшенного файла или None, если он не нужен.
+    """
+    limit = settings.IMAGE_MAX_SIDE
+    with Image.open(content_storage.path(name)) as image:
+        if max(image.size) <= limit or getattr(image, 'is_animated', False):
+            return None
+        image_format = image.format
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        with tempfile.TemporaryFile() as file:
+            image.save(file, image_format, quality=90)
+            return content_storage.save(name, File(file))
+
+
+@tasks.task()
+def generate(name):
+    """Создаёт все миниатюры картинки. Возвращает False при ошибке.
+
+    Если оригинал пришлось уменьшить, миниатюры создаются для
+    уменьшенного файла, а получатели thumbnails_generated переводят на
+    него посты (original — прежнее имя).
+    """
+    original = name
+    try:
+        name = downscale(original) or original
+    except (OSError, ValueError):
+        pass
+    token = generating.set(True)
+    try:
+        for geometry, options in geometries():
+            thumbnail = default.backend.get_thumbnail(
+                ImageFile(name, content_storage), geometry, **options)
+            if not thumbnail.exists():
+                cache.set(
+                    f'{FAILED_KEY_PREFIX}:{original}', True, FAILED_TIMEOUT)
+                return False
+    finally:
+        generating.reset(token)
+        cache.delete(f'{SCHEDULED_KEY_PREFIX}:{original}')
+    thumbnails_generated.send(sender=None, name=name, original=original)
+    return True
+
+
+def schedule(name):
+    """Ставит создание миниатюр в очередь задач core.tasks.
+
+    Пока задача ждёт, повторные вызовы для той же картинки — на каждый
+    промах бэкенда — не пишут в базу: их отсекает ключ в кеше.
+    """
+    if not name or cache.get(f'{FAILED_KEY_PREFIX}:{name}'):
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: generate(name))
+        return
+    if cache.add(
+        f'{SCHEDULED_KEY_PREFIX}:{name}', True, settings.TASK_TIMEOUT
+    ):
+        generate.enqueue(name, dedup_key=f'{SCHEDULED_KEY_PREFIX}:{name}')
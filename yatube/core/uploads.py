@@ -0,0 +1,22 @@
+"""Загрузка файлов на диск кусками с ограничением размера."""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет каждую загрузку во временный файл, а не в память.
+
+    После FILE_UPLOAD_MAX_BYTES байт данные больше не записываются, но
+    продолжают считаться: форма видит настоящий размер в file.size и
+    отклоняет файл, не открывая его. Память на загрузку — один кусок
+    (chunk_size), диск — не больше лимита.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.FILE_UPLOAD_MAX_BYTES:
+            self.file.write(raw_data)
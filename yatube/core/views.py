@@ -14,7 +14,7 @@ def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
 
 
-def permission_denied(request, exeption):
+def permission_denied(request, exception):
     return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
 
 
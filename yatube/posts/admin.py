@@ -1,33 +1,360 @@
-from django.contrib import admin
+from collections import Counter
 
-from .models import Group, Post, Comment, Follow
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import actions as admin_actions
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.options import IS_POPUP_VAR
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Max, QuerySet
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 
+from . import counters, jobs, search
+from .models import BulkJob, Group, Post, Comment, Follow, User
 
-class PostAdmin(admin.ModelAdmin):
+BEFORE_VAR = 'before'
+
+
+def estimated_count(model):
+    """Число строк таблицы без COUNT(*): по статистике планировщика
+    (counters.estimate_rows), а если её нет — по MAX(id).
+    """
+    count = counters.estimate_rows(model)
+    if count is not None:
+        return count
+    return model._default_manager.aggregate(last=Max('pk'))['last'] or 0
+
+
+def object_ids(objs):
+    """Отсортированные id объектов списка или QuerySet (без загрузки
+    самих объектов).
+    """
+    if isinstance(objs, QuerySet):
+        return sorted(objs.values_list('pk', flat=True))
+    return sorted(obj.pk for obj in objs)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Список без фильтров считается по оценке, отфильтрованный — точно,
+    но не дальше MAX_COUNT строк.
+    """
+
+    MAX_COUNT = 10_000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return estimated_count(self.object_list.model)
+        return self.object_list[:self.MAX_COUNT].count()
+
+
+class KeysetChangeList(ChangeList):
+    """Листает список по ?before=<id> вместо OFFSET: следующая страница —
+    объекты с id меньше последнего показанного.
+    """
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.count_estimated = not self.queryset.query.where
+        self.keyset_before = getattr(request, 'keyset_before', None)
+        self.keyset_first_url = self.get_query_string(
+            remove=[BEFORE_VAR, PAGE_VAR])
+        self.keyset_next_url = None
+        if len(self.result_list) >= self.list_per_page:
+            self.keyset_next_url = self.get_query_string(
+                {BEFORE_VAR: self.result_list[len(self.result_list) - 1].pk},
+                [PAGE_VAR],
+            )
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Подпись выбранного значения берётся из объекта строки, загруженного
+    через list_select_related, а не отдельным запросом на каждую строку.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.selected is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for option_value in value:
+            if option_value in self.selected:
+                options.append(self.create_option(
+                    name, option_value, self.selected[option_value], True,
+                    len(options)))
+        return [(None, options, 0)]
+
+
+class ScalableAdminMixin:
+    """Список объектов с фиксированным числом запросов на больших таблицах:
+    связанные объекты — через list_select_related, число строк — оценкой,
+    навигация — по id без OFFSET, внешние ключи — автодополнением.
+    Сортировка по столбцам отключена: она требовала бы ORDER BY без
+    индекса.
+    """
+
+    ordering = ('-pk',)
+    sortable_by = ()
+    list_per_page = 50
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        before = request.GET.get(BEFORE_VAR)
+        if before is not None:
+            request.GET = request.GET.copy()
+            del request.GET[BEFORE_VAR]
+            if before.isdigit():
+                request.keyset_before = int(before)
+        return super().changelist_view(request, extra_context)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        before = getattr(request, 'keyset_before', None)
+        if before is not None:
+            queryset = queryset.filter(pk__lt=before)
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if ('widget' not in kwargs
+                and db_field.name in self.get_autocomplete_fields(request)):
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        form = super().get_changelist_form(request, **kwargs)
+        names = [
+            name for name in self.list_editable
+            if name in self.autocomplete_fields
+        ]
+
+        class ChangelistForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                for name in names:
+                    widget = self.fields[name].widget
+                    widget = getattr(widget, 'widget', widget)
+                    related = getattr(self.instance, name)
+                    widget.selected = (
+                        {str(related.pk): str(related)} if related else {})
+
+        return ChangelistForm
+
+
+class BackgroundDeleteMixin:
+    """Удаление объектов фоновыми задачами posts.jobs вместо одного
+    каскадного DELETE в запросе админки.
+
+    Страница подтверждения показывает число объектов по моделям, а не
+    дерево каскада: его построение само загрузило бы все удаляемые
+    объекты. Права на удаление проверяются, как и в Django, для моделей
+    из шагов задач, у которых есть админка.
+    """
+
+    def deletion_jobs(self, objs):
+        """Пары (вид задачи, параметры) для удаления objs: по ним
+        строятся и страница подтверждения, и сами задачи.
+        """
+        return []
+
+    def get_deleted_objects(self, objs, request):
+        deletion_jobs = self.deletion_jobs(objs)
+        model_count = Counter()
+        for kind, params in deletion_jobs:
+            model_count.update(jobs.preview(kind, params))
+        perms_needed = self.missing_delete_permissions(request, deletion_jobs)
+        return [str(obj) for obj in objs], dict(model_count), perms_needed, []
+
+    def missing_delete_permissions(self, request, deletion_jobs):
+        """Названия моделей из шагов задач, удалять объекты которых
+        пользователю нельзя.
+        """
+        perms_needed = set()
+        for kind, params in deletion_jobs:
+            for step in jobs.plan(jobs.draft(kind, params)):
+                # Модели без админки (записи лент) удаляются вместе с
+                # объектами, как и при каскаде.
+                model_admin = self.admin_site._registry.get(step.model)
+                if (model_admin is not None
+                        and not model_admin.has_delete_permission(request)):
+                    perms_needed.add(step.model._meta.verbose_name)
+        return perms_needed
+
+    def delete_queryset(self, request, queryset):
+        for kind, params in self.deletion_jobs(queryset):
+            self.message_user_job(
+                request, jobs.create(kind, params, request.user))
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(
+            request, self.model._default_manager.filter(pk=obj.pk))
+
+    def response_delete(self, request, obj_display, obj_id):
+        if IS_POPUP_VAR in request.POST:
+            return super().response_delete(request, obj_display, obj_id)
+        # Об удалении уже сообщил delete_queryset(): оно только началось.
+        opts = self.model._meta
+        return HttpResponseRedirect(reverse(
+            f'admin:{opts.app_label}_{opts.model_name}_changelist',
+            current_app=self.admin_site.name,
+        ))
+
+    def message_user_job(self, request, job):
+        url = reverse(
+            'admin:posts_bulkjob_change', args=[job.pk],
+            current_app=self.admin_site.name)
+        self.message_user(request, format_html(
+            'Выполняется в фоне: <a href="{}">{}</a>', url, job))
+
+    def get_actions(self, request):
+        # Вместо стандартного действия под тем же именем: на него
+        # отправляет форма страницы подтверждения.
+        actions = super().get_actions(request)
+        if 'delete_selected' in actions:
+            _, name, description = actions['delete_selected']
+            actions[name] = (
+                type(self).delete_in_background, name, description)
+        return actions
+
+    def delete_in_background(self, request, queryset):
+        if not request.POST.get('post'):
+            # Страница подтверждения из стандартного действия.
+            return admin_actions.delete_selected(self, request, queryset)
+        if (not self.has_delete_permission(request)
+                or self.missing_delete_permissions(
+                    request, self.deletion_jobs(queryset))):
+            raise PermissionDenied
+        self.delete_queryset(request, queryset)
+        return None
+
+
+class FullTextSearchMixin:
+    """Поиск в списке объектов по индексу FTS5 вместо LIKE '%term%'."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            **search.matching(self.model, search_term)), False
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа',
+        widget=AutocompleteSelect(
+            Post._meta.get_field('group').remote_field, admin.site))
+
+
+class PostAdmin(BackgroundDeleteMixin, FullTextSearchMixin,
+                ScalableAdminMixin, admin.ModelAdmin):
 
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = ['move_to_group']
+
+    def deletion_jobs(self, objs):
+        return [(BulkJob.DELETE_POSTS, {'ids': object_ids(objs)})]
+
+    def move_to_group(self, request, queryset):
+        group = None
+        if request.POST.get('group'):
+            group = Group.objects.filter(pk=request.POST['group']).first()
+            if group is None:
+                self.message_user(
+                    request, 'Группа не найдена', messages.ERROR)
+                return
+        self.message_user_job(
+            request, jobs.move_posts(queryset, group, request.user))
+
+    move_to_group.allowed_permissions = ('change',)
+    move_to_group.short_description = 'Перенести в группу'
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'description')
+    search_fields = ('title',)
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, ScalableAdminMixin,
+                   admin.ModelAdmin):
     list_display = ('pk', 'text', 'author', 'post')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
 
 
+class UserAdmin(BackgroundDeleteMixin, BaseUserAdmin):
+
+    def deletion_jobs(self, objs):
+        return [
+            (BulkJob.DELETE_USER, {'user': pk}) for pk in object_ids(objs)]
+
+
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'description', 'status', 'progress', 'created', 'finished')
+    list_filter = ('status', 'kind')
+    actions = ['resume']
+
+    def progress(self, obj):
+        if not obj.total:
+            return '—'
+        percent = min(100, obj.processed * 100 // obj.total)
+        return f'{obj.processed} из {obj.total} ({percent}%)'
+
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def resume(self, request, queryset):
+        for job in queryset.filter(status=BulkJob.FAILED):
+            jobs.resume(job)
+
+    resume.allowed_permissions = ('view',)
+    resume.short_description = 'Продолжить прерванные'
+
+
+admin.site.unregister(User)
+admin.site.register(User, UserAdmin)
+admin.site.register(BulkJob, BulkJobAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,228 @@
+"""Замеры страниц приложения posts на сгенерированных данных.
+
+Для каждого размера набора данных база очищается и заполняется командой
+seed_yatube, после чего каждая страница из posts/urls.py запрашивается
+несколько раз. Результат — p50/p95 времени ответа, число SQL-запросов
+и суммарное время SQL на запрос. Само наполнение замеряется один раз и
+попадает в отдельный раздел: общее время, SQL и время этапов команды.
+"""
+import math
+import statistics
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core import testing
+from . import timeline
+from .management.commands import seed_yatube
+from .models import AuthorStats, Follow, Group, Post, User
+
+METRICS = ('p50_ms', 'p95_ms', 'queries', 'sql_ms')
+SEED_METRICS = ('total_ms', 'queries', 'sql_ms')
+
+
+class SqlRecorder:
+    """Обёртка для connection.execute_wrapper: считает запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def dataset_options(posts, seed):
+    return {
+        'posts': posts,
+        'users': max(posts // 20, 10),
+        'follows': posts // 2,
+        'comments': posts,
+        'groups': max(posts // 1000, 5),
+        'seed': seed,
+        'until': '2022-01-01',
+    }
+
+
+def seed(posts, seed=0):
+    """Заполняет базу и возвращает замер самой команды seed_yatube."""
+    call_command('flush', interactive=False, verbosity=0)
+    command = seed_yatube.Command(stdout=StringIO())
+    recorder = SqlRecorder()
+    with connection.execute_wrapper(recorder):
+        start = time.perf_counter()
+        call_command(command, **dataset_options(posts, seed))
+        duration = time.perf_counter() - start
+    cache.clear()
+    return {
+        'total_ms': round(duration * 1000, 3),
+        'queries': recorder.count,
+        'sql_ms': round(recorder.duration * 1000, 3),
+        'phases_ms': {
+            name: round(seconds * 1000, 3)
+            for name, seconds in command.timings.items()
+        },
+    }
+
+
+def pages(count):
+    return max(math.ceil(count / settings.COUNT_OF_SHOWED_POSTS), 1)
+
+
+def cases(depths):
+    """Замеры для текущих данных: (имя, метод, url, данные, сброс).
+
+    Сброс вызывается после каждого запроса вне замера и возвращает данные
+    в исходное состояние, чтобы подписка каждый раз создавалась заново.
+    """
+    reader = User.objects.annotate(
+        follows=Count('follower')).order_by('-follows', 'pk').first()
+    author = AuthorStats.objects.exclude(author=reader).order_by(
+        '-posts_count', 'pk').select_related('author').first().author
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    feeds = {
+        'index': (reverse('posts:index'), Post.objects.count()),
+        'group_list': (
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            group.total,
+        ),
+        'profile': (
+            reverse('posts:profile', kwargs={'username': author.username}),
+            author.posts.count(),
+        ),
+        'follow_index': (
+            reverse('posts:follow_index'),
+            timeline.Feed(reader).count(),
+        ),
+    }
+    result = []
+    for name, (url, count) in feeds.items():
+        last = pages(count)
+        for depth in depths:
+            if depth <= last:
+                result.append(
+                    (f'{name}?page={depth}', 'get', f'{url}?page={depth}',
+                     None, None))
+    follow_kwargs = {'username': author.username}
+    follows = Follow.objects.filter(user=reader, author=author)
+    result += [
+        ('post_detail', 'get',
+         reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+         None, None),
+        ('post_create', 'post', reverse('posts:post_create'),
+         {'text': 'Пост для замера'}, None),
+        ('add_comment', 'post',
+         reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+         {'text': 'Комментарий для замера'}, None),
+        ('profile_follow', 'get',
+         reverse('posts:profile_follow', kwargs=follow_kwargs), None,
+         lambda: follows.delete()),
+        ('profile_unfollow', 'get',
+         reverse('posts:profile_unfollow', kwargs=follow_kwargs), None,
+         lambda: Follow.objects.create(user=reader, author=author)),
+    ]
+    if follows.exists():
+        # Замер подписки начинается без неё, отписки — с ней.
+        result[-2:] = result[-1:-3:-1]
+    return reader, result
+
+
+def measure(client, method, url, data, reset, repeat, cold_cache=False):
+    def before():
+        if reset:
+            reset()
+        if cold_cache:
+            cache.clear()
+
+    timing, recorders, response = testing.measure(
+        lambda: getattr(client, method)(url, data), repeat, before,
+        SqlRecorder)
+    return {
+        'status': response.status_code,
+        **timing,
+        'queries': statistics.median(
+            recorder.count for recorder in recorders),
+        'sql_ms': round(statistics.median(
+            recorder.duration for recorder in recorders) * 1000, 3),
+    }
+
+
+def run(sizes, depths=(1,), repeat=20, cold_cache=False, seed_value=0,
+        log=None, log_seed=None):
+    """Прогоняет все замеры для каждого размера набора данных.
+
+    Возвращает замеры страниц и замеры наполнения по размерам.
+    """
+    results, seeds = {}, {}
+    for size in sizes:
+        seeds[str(size)] = seed(size, seed_value)
+        if log_seed:
+            log_seed(size, seeds[str(size)])
+        results[str(size)] = size_results = {}
+        reader, size_cases = cases(depths)
+        client = Client()
+        client.force_login(reader)
+        for name, method, url, data, reset in size_cases:
+            size_results[name] = measure(
+                client, method, url, data, reset, repeat, cold_cache)
+            if log:
+                log(size, name, size_results[name])
+    return results, seeds
+
+
+def compare(results, baseline, threshold=0.2, metrics=METRICS,
+            timed=('p95_ms', 'sql_ms')):
+    """Сравнивает результаты с базовыми.
+
+    Регрессия — рост числа запросов или рост метрик времени timed больше
+    чем на долю threshold.
+    """
+    comparison = []
+    for size, size_results in results.items():
+        for name, current in size_results.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            change = {
+                metric: (
+                    round(current[metric] / base[metric] - 1, 3)
+                    if base[metric] else None
+                )
+                for metric in metrics
+            }
+            regressions = []
+            if current['queries'] > base['queries']:
+                regressions.append('queries')
+            for metric in timed:
+                if change[metric] is not None and change[metric] > threshold:
+                    regressions.append(metric)
+            comparison.append({
+                'size': size,
+                'case': name,
+                'change': change,
+                'regressions': regressions,
+            })
+    return comparison
+
+
+def compare_seeds(seeds, baseline, threshold=0.2):
+    """compare() для замеров наполнения: время команды и SQL."""
+    return compare(
+        {size: {'seed_yatube': result} for size, result in seeds.items()},
+        {size: {'seed_yatube': result} for size, result in baseline.items()},
+        threshold, metrics=SEED_METRICS, timed=('total_ms', 'sql_ms'),
+    )
@@ -0,0 +1,96 @@
+"""Условные GET-запросы для лент и страниц постов.
+
+ETag и Last-Modified строятся из версий в кеше (см. versions), а не из
+тела ответа, поэтому совпавший запрос получает 304 до выполнения view
+и рендеринга шаблона.
+"""
+import hashlib
+
+from django.views.decorators.http import condition
+
+from . import versions
+from .models import Group, Post, User
+
+
+def index_keys():
+    return [versions.feed_version_key()]
+
+
+def group_keys(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return [versions.feed_version_key(group_id=group_id)]
+
+
+def profile_keys(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [
+        versions.feed_version_key(author_id=author_id),
+        versions.profile_version_key(author_id),
+    ]
+
+
+def post_keys(post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id').first()
+    if post is None:
+        return None
+    # Кроме самого поста страница показывает число постов автора, его
+    # имя и название группы.
+    keys = [
+        versions.post_version_key(post_id),
+        versions.feed_version_key(author_id=post['author_id']),
+        versions.profile_version_key(post['author_id']),
+    ]
+    if post['group_id'] is not None:
+        keys.append(versions.feed_version_key(group_id=post['group_id']))
+    return keys
+
+
+def conditional_page(get_keys):
+    """Декоратор view: 304, если версии страницы не изменились.
+
+    get_keys получает аргументы view и возвращает ключи версий страницы
+    или None, если объекта нет.
+    """
+
+    def page_versions(request, *args, **kwargs):
+        # Оба валидатора вызываются для одного запроса: версии читаются
+        # из кеша один раз.
+        if not hasattr(request, '_page_versions'):
+            keys = get_keys(*args, **kwargs)
+            request._page_versions = (
+                versions.get_versions(keys) if keys is not None else None)
+        return request._page_versions
+
+    def etag(request, *args, **kwargs):
+        page = page_versions(request, *args, **kwargs)
+        if page is None:
+            return None
+        user_id = request.user.pk if request.user.is_authenticated else 0
+        # Формы страницы содержат CSRF-токен: после его смены (вход,
+        # выход) закешированная браузером страница не годится.
+        parts = [
+            *map(str, page), str(user_id), request.GET.urlencode(),
+            request.META.get('CSRF_COOKIE', ''),
+        ]
+        digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+        # Слабый ETag: разметка отличается маской CSRF-токена.
+        return f'W/"{digest}"'
+
+    def last_modified(request, *args, **kwargs):
+        # Страница зависит от пользователя, а дата изменения — нет:
+        # авторизованным отдаём только ETag.
+        if request.user.is_authenticated:
+            return None
+        page = page_versions(request, *args, **kwargs)
+        if page is None:
+            return None
+        return versions.as_datetime(max(page))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
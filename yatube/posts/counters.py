@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+COUNT_KEY_PREFIX = 'posts:count'
+
+
+def feed_count_key(group_id=None, author_id=None):
+    if group_id is not None:
+        return f'{COUNT_KEY_PREFIX}:group:{group_id}'
+    if author_id is not None:
+        return f'{COUNT_KEY_PREFIX}:author:{author_id}'
+    return f'{COUNT_KEY_PREFIX}:all'
+
+
+def post_count_keys(post, group_id=None):
+    """Ключи всех лент, в которые попадает пост."""
+    keys = [feed_count_key(), feed_count_key(author_id=post.author_id)]
+    group_id = post.group_id if group_id is None else group_id
+    if group_id is not None:
+        keys.append(feed_count_key(group_id=group_id))
+    return keys
+
+
+def estimate_rows(model):
+    """Оценка числа строк таблицы по статистике планировщика.
+
+    Возвращает None, если статистики нет (например, не было ANALYZE).
+    """
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    estimates = [int(str(row[0]).split()[0]) for row in rows if row[0]]
+    return max(estimates, default=None)
+
+
+def get_count(key, queryset):
+    """Число строк ленты и его источник: 'cache', 'estimate' или 'query'.
+
+    Для общей ленты на очень больших таблицах вместо COUNT(*)
+    используется оценка по статистике планировщика.
+    """
+    count = cache.get(key)
+    if count is not None:
+        return count, 'cache'
+    if key == feed_count_key():
+        estimate = cache.get(f'{key}:estimate')
+        if estimate is None:
+            estimate = estimate_rows(queryset.model)
+        if (
+            estimate is not None
+            and estimate >= settings.POSTS_COUNT_ESTIMATE_THRESHOLD
+        ):
+            cache.set(
+                f'{key}:estimate', estimate,
+                settings.POSTS_COUNT_CACHE_TIMEOUT
+            )
+            return estimate, 'estimate'
+    count = queryset.count()
+    cache.set(key, count, settings.POSTS_COUNT_CACHE_TIMEOUT)
+    return count, 'query'
+
+
+def invalidate(key):
+    cache.delete(key)
+
+
+def change(keys, delta):
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Счётчика нет в кеше — его посчитают при следующем чтении.
+            pass
@@ -1,13 +1,55 @@
 from django import forms
+from django.conf import settings
 
 from .models import Post, Comment
 
 
 class PostForm(forms.ModelForm):
+    """Картинка проверяется по размеру файла до разбора и по числу
+    пикселей из заголовка, который forms.ImageField читает без
+    декодирования.
+    """
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл больше лимита записан не целиком (LimitedTemporaryFile-
+        # UploadHandler), поэтому он не передаётся полю вовсе.
+        image = self.files.get('image')
+        self.image_too_large = (
+            image is not None
+            and image.size > settings.FILE_UPLOAD_MAX_BYTES
+        )
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        header = getattr(image, 'image', None)
+        if header is not None:
+            width, height = header.size
+            if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+                raise forms.ValidationError(
+                    'Картинка больше %(limit)d мегапикселей.',
+                    code='too_many_pixels',
+                    params={
+                        'limit': settings.IMAGE_UPLOAD_MAX_PIXELS // 10**6},
+                )
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_too_large:
+            self.add_error('image', forms.ValidationError(
+                'Файл больше %(limit)d МБ.', code='too_large',
+                params={'limit': settings.FILE_UPLOAD_MAX_BYTES // 2**20},
+            ))
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,40 @@
+"""Сведения о картинках постов, которые хранятся рядом с полем image."""
+from collections import namedtuple
+
+from django.core.exceptions import SuspiciousFileOperation
+from PIL import Image
+
+ImageInfo = namedtuple('ImageInfo', 'width height size format')
+
+EMPTY = ImageInfo(None, None, None, '')
+
+
+def read(file, size):
+    """Pillow разбирает только заголовок файла, пиксели не декодируются."""
+    file.seek(0)
+    try:
+        with Image.open(file) as picture:
+            return ImageInfo(picture.width, picture.height, size,
+                             picture.format or '')
+    finally:
+        file.seek(0)
+
+
+def image_info(image):
+    """ImageInfo для значения ImageField; EMPTY, если файл не читается."""
+    if not image:
+        return EMPTY
+    try:
+        if not image._committed:
+            return read(image.file, image.size)
+        with image.storage.open(image.name) as file:
+            return read(file, image.storage.size(image.name))
+    except (OSError, ValueError, SuspiciousFileOperation):
+        return EMPTY
+
+
+def apply(post, info):
+    post.image_width = info.width
+    post.image_height = info.height
+    post.image_size = info.size
+    post.image_format = info.format
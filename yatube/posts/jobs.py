@@ -0,0 +1,266 @@
+"""Фоновые задачи над множеством объектов: удаление и перенос постов,
+удаление пользователя со всем, что он написал.
+
+Каскадное удаление автора с тысячами постов одной транзакцией надолго
+занимает единственного писателя SQLite. Задача же проходит по шагам,
+каждый шаг — частями по batch_size объектов в отдельных транзакциях, с
+паузой между ними. Номер шага, курсор (id последнего объекта) и
+прогресс хранятся в BulkJob, поэтому прерванная задача продолжается с
+места остановки. Выполняют задачи воркеры очереди core.tasks, а
+брошенные подхватывает команда run_bulk_jobs.
+
+Объекты удаляются через QuerySet.delete(), так что сигналы, которые
+поддерживают счётчики, статистику и ленты, срабатывают как обычно.
+"""
+import bisect
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import tasks
+from .models import (BulkJob, Comment, Follow, Group, Post, TimelineEntry,
+                     User)
+
+logger = logging.getLogger(__name__)
+
+
+class Step:
+    """Шаг задачи: объекты queryset (если задан ids — только эти id) по
+    возрастанию id, к каждой части применяется action(model, pks).
+    """
+
+    def __init__(self, queryset, action, ids=None):
+        self.queryset = queryset
+        self.action = action
+        self.ids = ids
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    def batch(self, cursor, size):
+        queryset = self.queryset.filter(pk__gt=cursor)
+        if self.ids is not None:
+            start = bisect.bisect_right(self.ids, cursor)
+            queryset = queryset.filter(pk__in=self.ids[start:start + size])
+        return list(
+            queryset.order_by('pk').values_list('pk', flat=True)[:size])
+
+    def count(self):
+        if self.ids is not None:
+            return len(self.ids)
+        return self.queryset.count()
+
+    def apply(self, pks):
+        self.action(self.model, pks)
+
+
+def delete(model, pks):
+    model._default_manager.filter(pk__in=pks).delete()
+
+
+def move(group_id):
+    def action(model, pks):
+        # Через save(), чтобы сигналы поправили счётчики и кеши групп.
+        for post in model._default_manager.filter(pk__in=pks):
+            if post.group_id != group_id:
+                post.group_id = group_id
+                post.save(update_fields=['group', 'updated'])
+    return action
+
+
+def plan(job):
+    """Шаги задачи job."""
+    params = json.loads(job.params)
+    if job.kind == BulkJob.DELETE_POSTS:
+        ids = params['ids']
+        # Как и у пользователя: записи лент и комментарии удаляются
+        # своими шагами, а не каскадом вместе с частью постов.
+        return [
+            Step(TimelineEntry.objects.filter(post_id__in=ids), delete),
+            Step(Comment.objects.filter(post_id__in=ids), delete),
+            Step(Post.objects.all(), delete, ids=ids),
+        ]
+    if job.kind == BulkJob.MOVE_POSTS:
+        return [
+            Step(Post.objects.all(), move(params['group']), ids=params['ids'])
+        ]
+    if job.kind == BulkJob.DELETE_USER:
+        user_id = params['user']
+        # Сначала всё, что иначе удалилось бы каскадом одним запросом:
+        # записи лент подписчиков с его постами, подписки, комментарии
+        # (его и к его постам), затем посты и сам пользователь.
+        return [
+            Step(TimelineEntry.objects.filter(post__author_id=user_id),
+                 delete),
+            Step(Follow.objects.filter(
+                Q(user_id=user_id) | Q(author_id=user_id)), delete),
+            Step(Comment.objects.filter(
+                Q(author_id=user_id) | Q(post__author_id=user_id)), delete),
+            Step(Post.objects.filter(author_id=user_id), delete),
+            Step(TimelineEntry.objects.filter(user_id=user_id), delete),
+            Step(User.objects.filter(pk=user_id), delete),
+        ]
+    raise ValueError(f'Неизвестный вид задачи: {job.kind}')
+
+
+def counts(job):
+    """Сколько объектов каждой модели затронет задача."""
+    result = {}
+    for step in plan(job):
+        name = step.model._meta.verbose_name_plural
+        result[name] = result.get(name, 0) + step.count()
+    return result
+
+
+def draft(kind, params):
+    """Несохранённая задача: для plan() и counts() до её создания."""
+    return BulkJob(kind=kind, params=json.dumps(params))
+
+
+def preview(kind, params):
+    """counts() для задачи, которая ещё не создана."""
+    return counts(draft(kind, params))
+
+
+def describe(kind, params):
+    """Описание задачи для списка задач в админке."""
+    if kind == BulkJob.DELETE_POSTS:
+        return f'Удаление постов: {len(params["ids"])}'
+    if kind == BulkJob.MOVE_POSTS:
+        target = Group.objects.filter(pk=params['group']).values_list(
+            'title', flat=True).first() or 'без группы'
+        return f'Перенос постов ({len(params["ids"])}): {target}'
+    if kind == BulkJob.DELETE_USER:
+        username = User.objects.filter(pk=params['user']).values_list(
+            'username', flat=True).first()
+        return f'Удаление пользователя {username}'
+    raise ValueError(f'Неизвестный вид задачи: {kind}')
+
+
+def create(kind, params, created_by=None):
+    """Создаёт задачу и ставит её в очередь.
+
+    Удаляемый пользователь сразу отключается, чтобы не писать новых
+    постов, пока удаляются старые.
+    """
+    if kind == BulkJob.DELETE_USER:
+        User.objects.filter(pk=params['user']).update(is_active=False)
+    job = BulkJob(
+        kind=kind,
+        description=describe(kind, params),
+        params=json.dumps(params),
+        batch_size=settings.BULK_JOB_BATCH_SIZE,
+        created_by=created_by,
+    )
+    job.total = sum(counts(job).values())
+    job.save()
+    schedule(job)
+    return job
+
+
+def delete_posts(queryset, created_by=None):
+    ids = sorted(queryset.values_list('pk', flat=True))
+    return create(BulkJob.DELETE_POSTS, {'ids': ids}, created_by)
+
+
+def move_posts(queryset, group, created_by=None):
+    ids = sorted(queryset.values_list('pk', flat=True))
+    return create(
+        BulkJob.MOVE_POSTS,
+        {'ids': ids, 'group': group.pk if group is not None else None},
+        created_by)
+
+
+def delete_user(user, created_by=None):
+    return create(BulkJob.DELETE_USER, {'user': user.pk}, created_by)
+
+
+def claim(job):
+    """Занимает задачу на BULK_JOB_LEASE секунд, если её не выполняет
+    другой процесс.
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.BULK_JOB_LEASE)
+    claimed = BulkJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        pk=job.pk,
+        status__in=[BulkJob.PENDING, BulkJob.RUNNING],
+    ).update(status=BulkJob.RUNNING, locked_until=locked_until)
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def run(job, pause=None):
+    """Выполняет задачу до конца. False, если она уже занята или
+    завершена.
+    """
+    if not claim(job):
+        return False
+    if pause is None:
+        pause = settings.BULK_JOB_PAUSE
+    lease = timedelta(seconds=settings.BULK_JOB_LEASE)
+    try:
+        steps = plan(job)
+        while job.step < len(steps):
+            step = steps[job.step]
+            with transaction.atomic():
+                pks = step.batch(job.cursor, job.batch_size)
+                if pks:
+                    step.apply(pks)
+                    job.cursor = pks[-1]
+                    job.processed += len(pks)
+                else:
+                    job.step += 1
+                    job.cursor = 0
+                job.locked_until = timezone.now() + lease
+                job.save(update_fields=[
+                    'step', 'cursor', 'processed', 'locked_until'])
+            if pks and pause:
+                time.sleep(pause)
+    except Exception as error:
+        logger.exception('Фоновая задача %s прервана', job.pk)
+        job.status = BulkJob.FAILED
+        job.error = repr(error)
+        job.locked_until = None
+        job.save(update_fields=['status', 'error', 'locked_until'])
+        return False
+    job.status = BulkJob.DONE
+    job.finished = timezone.now()
+    job.locked_until = None
+    job.save(update_fields=['status', 'finished', 'locked_until'])
+    return True
+
+
+def resume(job):
+    """Возвращает прерванную задачу в очередь с того же места."""
+    BulkJob.objects.filter(pk=job.pk, status=BulkJob.FAILED).update(
+        status=BulkJob.PENDING, error='', locked_until=None)
+    schedule(job)
+
+
+def unfinished():
+    """Задачи, которые никто не выполняет: новые и брошенные."""
+    return BulkJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=timezone.now()),
+        status__in=[BulkJob.PENDING, BulkJob.RUNNING],
+    ).order_by('pk')
+
+
+@tasks.task(priority=tasks.LOW)
+def run_job(pk):
+    job = BulkJob.objects.filter(pk=pk).first()
+    if job is not None:
+        run(job)
+
+
+def schedule(job):
+    """Ставит выполнение задачи в очередь core.tasks."""
+    run_job.enqueue(job.pk, dedup_key=f'bulk-job:{job.pk}')
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import IMAGE_INFO_FIELDS, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ширину, высоту, размер и формат картинок постов, '
+        'сохранённых до появления этих полей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько постов обновлять одним запросом',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перечитать и уже заполненные картинки',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk').only(
+            'pk', 'image', *IMAGE_INFO_FIELDS)
+        if not options['all']:
+            posts = posts.filter(image_format='')
+        chunk_size = options['chunk_size']
+        last_pk = updated = failed = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            for post in chunk:
+                info = images.image_info(post.image)
+                failed += info is images.EMPTY
+                images.apply(post, info)
+            Post.objects.bulk_update(chunk, IMAGE_INFO_FIELDS)
+            updated += len(chunk)
+            last_pk = chunk[-1].pk
+            self.stdout.write(f'Обработано постов: {updated}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Сведения о картинках обновлены: {updated - failed}, '
+            f'не прочитано файлов: {failed}'))
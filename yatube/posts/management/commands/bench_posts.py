@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.testing import benchmark_environment, write_report
+from posts import benchmarks
+
+
+def int_list(value):
+    try:
+        return [int(item) for item in value.split(',') if item]
+    except ValueError:
+        raise CommandError(f'Ожидается список чисел через запятую: {value}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts на сгенерированных данных разного размера '
+        'и сравнивает результат с базовым. Работает на отдельной тестовой '
+        'базе и временном кеше, рабочие данные не затрагиваются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int_list, default=[1000, 10000],
+            help='Размеры данных в постах через запятую',
+        )
+        parser.add_argument(
+            '--depths', type=int_list, default=[1, 10, 100],
+            help='Номера страниц лент через запятую',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help='Очищать кеш перед каждым запросом',
+        )
+        parser.add_argument('--output', default='bench_posts.json')
+        parser.add_argument(
+            '--baseline', help='JSON с результатами прошлого запуска',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 и времени SQL, доля',
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой, если есть регрессии',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+                baseline_results = baseline['results']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(
+                    f'Не удалось прочитать базовые результаты: {error}')
+
+        with benchmark_environment():
+            results, seeds = benchmarks.run(
+                options['sizes'],
+                depths=options['depths'],
+                repeat=options['repeat'],
+                cold_cache=options['cold_cache'],
+                seed_value=options['seed'],
+                log=self.log,
+                log_seed=self.log_seed,
+            )
+
+        comparison = None
+        regressions = []
+        if baseline is not None:
+            comparison = benchmarks.compare(
+                results, baseline_results, options['threshold'])
+            comparison += benchmarks.compare_seeds(
+                seeds, baseline.get('seed_yatube', {}), options['threshold'])
+            regressions = [item for item in comparison if item['regressions']]
+        write_report(
+            options['output'], results, comparison,
+            sections={'seed_yatube': seeds},
+            repeat=options['repeat'],
+            seed=options['seed'],
+            cold_cache=options['cold_cache'],
+        )
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        for item in regressions:
+            self.stdout.write(self.style.WARNING(
+                f'{item["size"]} {item["case"]}: '
+                f'{", ".join(item["regressions"])} {item["change"]}'))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def log(self, size, name, result):
+        self.stdout.write(
+            f'{size:>8} {name:<28} p50 {result["p50_ms"]:>9.2f} мс  '
+            f'p95 {result["p95_ms"]:>9.2f} мс  '
+            f'SQL {result["queries"]:>4} / {result["sql_ms"]:>8.2f} мс'
+        )
+
+    def log_seed(self, size, result):
+        phases = ', '.join(
+            f'{name} {ms / 1000:.2f}'
+            for name, ms in result['phases_ms'].items()
+        )
+        self.stdout.write(
+            f'{size:>8} {"seed_yatube":<28} '
+            f'{result["total_ms"] / 1000:>8.2f} с  '
+            f'SQL {result["queries"]:>6} / {result["sql_ms"] / 1000:>6.2f} с'
+            f'  ({phases})'
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Индексирует тексты постов и комментариев для полнотекстового '
+        'поиска. Новые записи индексируют триггеры, команда нужна для '
+        'уже существующих'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Сколько строк индексировать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_all(
+            options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('Проиндексировано: ' + ', '.join(
+            f'{model._meta.verbose_name_plural} — {count}'
+            for model, count in indexed.items()
+        )))
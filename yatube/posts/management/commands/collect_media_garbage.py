@@ -0,0 +1,94 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import media
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов и миниатюры, на которые ничего не '
+        'ссылается, если они не менялись дольше периода ожидания'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GRACE_PERIOD,
+            help='Не трогать файлы моложе стольких секунд',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов проверять по базе одним запросом',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=200,
+            help='Не больше стольких файловых операций в секунду; 0 — '
+                 'без ограничения',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.throttle = media.Throttle(options['rate'])
+        self.deadline = time.time() - options['grace']
+        self.scanned = self.deleted = self.freed = 0
+        # Сначала оригиналы: media.delete() убирает и их миниатюры.
+        self.collect(
+            Post.image.field.upload_to.rstrip('/'),
+            media.referenced_images, self.delete_image,
+        )
+        self.collect(
+            media.thumbnails_directory(),
+            media.referenced_thumbnails, default.storage.delete,
+        )
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {self.scanned}. {verb}: {self.deleted}, '
+            f'{self.freed / 2**20:.1f} МБ'))
+
+    def collect(self, directory, referenced, delete):
+        files = self.paced(media.walk(directory))
+        while True:
+            chunk = list(islice(files, self.options['batch_size']))
+            if not chunk:
+                break
+            batch = [
+                (name, size) for name, size, modified in chunk
+                if modified <= self.deadline
+            ]
+            kept = referenced([name for name, _ in batch]) if batch else ()
+            for name, size in batch:
+                if name in kept:
+                    continue
+                self.deleted += 1
+                self.freed += size
+                if self.options['dry_run']:
+                    self.stdout.write(name)
+                    continue
+                self.throttle.wait()
+                delete(name)
+
+    def delete_image(self, name):
+        # Повторная загрузка той же картинки обновляет mtime файла: если
+        # это случилось после проверки, новый пост на него уже ссылается.
+        storage = Post.image.field.storage
+        try:
+            if os.path.getmtime(storage.path(name)) > self.deadline:
+                return
+        except FileNotFoundError:
+            return
+        media.delete(name)
+
+    def paced(self, files):
+        for item in files:
+            self.throttle.wait()
+            self.scanned += 1
+            yield item
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт адаптивные варианты и миниатюры из THUMBNAIL_GEOMETRIES '
+        'для всех картинок постов в пуле процессов. Готовые миниатюры '
+        'пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.THUMBNAIL_WORKERS or os.cpu_count(),
+            help='Число процессов; 0 — в текущем процессе',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько картинок отдавать пулу за раз',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by('image').values_list(
+            'image', flat=True).distinct().iterator()
+        done = failed = 0
+        if options['workers']:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=thumbnails.init_worker,
+            )
+            run = executor.map
+        else:
+            executor = None
+            run = map
+        try:
+            while True:
+                chunk = list(islice(names, options['chunk_size']))
+                if not chunk:
+                    break
+                for generated in run(thumbnails.generate, chunk):
+                    done += generated
+                    failed += not generated
+                self.stdout.write(f'Обработано картинок: {done + failed}')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы: {done}, ошибок: {failed}'))
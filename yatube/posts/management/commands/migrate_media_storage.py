@@ -0,0 +1,78 @@
+import os
+import shutil
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from core.storage import content_name_re
+from posts import media
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, сохранённые до хранилища по хешу '
+        'содержимого, в posts/ab/cd/<sha256>: файл переименовывается на '
+        'месте, одинаковые картинки склеиваются в один файл'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько имён файлов выбирать одним запросом',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет перенесено',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post.image.field.storage
+        directory = Post.image.field.upload_to.rstrip('/')
+        names = Post.objects.exclude(image='').exclude(
+            image__regex=content_name_re(directory),
+        ).order_by('image').values_list('image', flat=True).distinct()
+        last_name = ''
+        moved = merged = missing = 0
+        while True:
+            chunk = list(names.filter(image__gt=last_name)[
+                :options['chunk_size']])
+            if not chunk:
+                break
+            last_name = chunk[-1]
+            for name in chunk:
+                try:
+                    with storage.open(name) as file:
+                        new_name = storage.content_name(name, File(file))
+                except OSError:
+                    missing += 1
+                    self.stderr.write(f'Файл не найден: {name}')
+                    continue
+                exists = storage.exists(new_name)
+                merged += exists
+                moved += not exists
+                if options['dry_run']:
+                    self.stdout.write(f'{name} -> {new_name}')
+                    continue
+                self.move(storage, name, new_name, exists)
+            self.stdout.write(f'Обработано файлов: {moved + merged + missing}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено: {moved}, совпали с существующими: {merged}, '
+            f'не найдено: {missing}'))
+        if moved and not options['dry_run']:
+            self.stdout.write(
+                'Миниатюры для новых имён создаст generate_thumbnails')
+
+    def move(self, storage, name, new_name, exists):
+        # Сначала жёсткая ссылка и обновление постов, потом удаление
+        # старого имени: при сбое посты ссылаются на существующий файл.
+        if not exists:
+            path = storage.path(new_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(storage.path(name), path)
+            except OSError:
+                shutil.copy2(storage.path(name), path)
+        Post.objects.filter(image=name).update(image=new_name)
+        media.refresh_posts(new_name)
+        media.delete(name)
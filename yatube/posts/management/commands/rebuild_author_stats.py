@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import stats
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписок авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько авторов пересчитывать в одной транзакции',
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            author_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not author_ids:
+                break
+            with transaction.atomic():
+                wrong = stats.rebuild(author_ids, check=options['check'])
+            for author_stats in wrong:
+                self.stdout.write(
+                    f'author_id={author_stats.author_id}: '
+                    f'posts={author_stats.posts_count} '
+                    f'followers={author_stats.followers_count} '
+                    f'following={author_stats.following_count}'
+                )
+            checked += len(author_ids)
+            fixed += len(wrong)
+            last_pk = author_ids[-1]
+        verb = 'Расхождений' if options['check'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено авторов: {checked}. {verb}: {fixed}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import jobs
+from posts.models import BulkJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи админки, которые никто не выполняет: '
+        'новые и прерванные, с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pause', type=float, default=None,
+            help='Пауза между частями, секунд',
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        for job in jobs.unfinished():
+            self.stdout.write(f'{job}: {job.processed} из {job.total}')
+            if jobs.run(job, pause=options['pause']):
+                done += 1
+            else:
+                job.refresh_from_db()
+                if job.status == BulkJob.FAILED:
+                    self.stderr.write(f'{job}: {job.error}')
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
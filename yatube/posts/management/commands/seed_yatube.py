@@ -0,0 +1,308 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import counters, stats, timeline, versions
+from posts.models import Comment, Follow, Group, Post, User
+
+TEXTS_POOL_SIZE = 2000
+SEED_PASSWORD = 'yatube-seed'
+# Ключей кеша в одном запросе к нему
+INVALIDATE_CHUNK = 500
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет bulk_create сохранить заданные даты вместо auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def fast_sqlite_writes():
+    # Внутри транзакции (например, в тестах) SQLite не меняет PRAGMA.
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = FULL')
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу реалистичными данными: авторы со степенным '
+        'распределением подписчиков, пачки постов, группы и комментарии. '
+        'При одинаковых --seed и --until результат одинаков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--until', help='Дата последнего поста, ГГГГ-ММ-ДД '
+            '(по умолчанию — сегодня)',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --until распределить посты',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк вставлять в одной транзакции',
+        )
+        parser.add_argument(
+            '--timeline-backfill', type=int,
+            help='Сколько последних постов каждой подписки переносить в '
+            'ленту (по умолчанию TIMELINE_BACKFILL_LIMIT). Лента '
+            'получает до стольких строк на подписку: на 100 тысячах '
+            'постов это миллионы строк и основное время наполнения',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and options['follows']:
+            raise CommandError('Для подписок нужно минимум два пользователя')
+        if not options['users'] and (options['posts'] or options['comments']):
+            raise CommandError('Для постов и комментариев нужны пользователи')
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.timeline_backfill = options['timeline_backfill']
+        until = options['until'] or timezone.now().date().isoformat()
+        self.until = timezone.make_aware(
+            datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1))
+        self.span = timedelta(days=options['days']).total_seconds()
+        self.texts = [
+            self.faker.paragraph(nb_sentences=self.random.randint(1, 6))
+            for _ in range(TEXTS_POOL_SIZE)
+        ]
+
+        self.timings = {}
+        with fast_sqlite_writes(), explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            with self.phase('пользователи'):
+                user_ids = self.create_users(options['users'])
+            with self.phase('группы'):
+                group_ids = self.create_groups(options['groups'])
+            # Популярность авторов распределена по степенному закону:
+            # немногие авторы собирают большую часть подписчиков и постов.
+            self.popularity = list(accumulate(
+                self.random.paretovariate(1.2) for _ in user_ids))
+            with self.phase('посты'):
+                posts = self.create_posts(
+                    options['posts'], user_ids, group_ids)
+            with self.phase('подписки'):
+                self.create_follows(options['follows'], user_ids)
+            with self.phase('комментарии'):
+                self.create_comments(options['comments'], user_ids, posts)
+        self.rebuild_derived(user_ids, posts)
+        self.invalidate_cache(user_ids, group_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(user_ids)}, групп '
+            f'{len(group_ids)}, постов {len(posts)}, '
+            f'подписок {self.follows_created}, '
+            f'комментариев {options["comments"]}'
+        ))
+        self.stdout.write('Время, с: ' + ', '.join(
+            f'{name} {seconds:.2f}' for name, seconds in self.timings.items()
+        ))
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def invalidate_cache(self, user_ids, group_ids):
+        """Сбрасывает счётчики и версии лент, в которые попали новые
+        посты и подписки. Остальной общий кеш (сессии, миниатюры) команда
+        не трогает.
+        """
+        feeds = [{}, *(
+            {'group_id': group_id} for group_id in group_ids
+        ), *(
+            {'author_id': user_id} for user_id in user_ids
+        )]
+        keys = [f'{counters.feed_count_key()}:estimate'] + [
+            counters.feed_count_key(**feed) for feed in feeds]
+        version_keys = [
+            versions.feed_version_key(**feed) for feed in feeds
+        ] + [versions.profile_version_key(user_id) for user_id in user_ids]
+        for i in range(0, len(keys), INVALIDATE_CHUNK):
+            cache.delete_many(keys[i:i + INVALIDATE_CHUNK])
+        for i in range(0, len(version_keys), INVALIDATE_CHUNK):
+            versions.bump(version_keys[i:i + INVALIDATE_CHUNK])
+
+    def insert(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+
+    def new_ids(self, model, start, count):
+        last = self.last_pk(model)
+        if last - start == count:
+            return range(start + 1, last + 1)
+        return list(model.objects.filter(pk__gt=start).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def create_users(self, count):
+        start = self.last_pk(User)
+        password = make_password(SEED_PASSWORD)
+        batch = []
+        for i in range(start + 1, start + count + 1):
+            batch.append(User(
+                username=f'user{i}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            ))
+            if len(batch) >= self.batch_size:
+                self.insert(User, batch)
+                batch = []
+        self.insert(User, batch)
+        return self.new_ids(User, start, count)
+
+    def create_groups(self, count):
+        start = self.last_pk(Group)
+        self.insert(Group, [
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'group-{i}',
+                description=self.faker.paragraph(),
+            )
+            for i in range(start + 1, start + count + 1)
+        ])
+        return self.new_ids(Group, start, count)
+
+    def popular(self, user_ids, k=1):
+        return self.random.choices(
+            user_ids, cum_weights=self.popularity, k=k)
+
+    def bursts(self, count, user_ids):
+        """Посты выходят пачками: автор пишет несколько постов подряд."""
+        while count > 0:
+            author_id = self.popular(user_ids)[0]
+            burst = min(count, int(self.random.paretovariate(1.5)))
+            moment = self.random.uniform(0, self.span)
+            for _ in range(burst):
+                yield author_id, moment
+                moment = max(moment - self.random.expovariate(1 / 900), 0)
+            count -= burst
+
+    def create_posts(self, count, user_ids, group_ids):
+        start = self.last_pk(Post)
+        dates = []
+        batch = []
+        for author_id, moment in self.bursts(count, user_ids):
+            group_id = None
+            if group_ids and self.random.random() < 0.7:
+                group_id = group_ids[
+                    min(int(self.random.paretovariate(1.0)) - 1,
+                        len(group_ids) - 1)]
+            pub_date = self.until - timedelta(seconds=moment)
+            dates.append(pub_date)
+            batch.append(Post(
+                text=self.random.choice(self.texts),
+                author_id=author_id,
+                group_id=group_id,
+                pub_date=pub_date,
+            ))
+            if len(batch) >= self.batch_size:
+                self.insert(Post, batch)
+                batch = []
+        self.insert(Post, batch)
+        return list(zip(self.new_ids(Post, start, count), dates))
+
+    def create_follows(self, count, user_ids):
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < 20:
+            attempts += 1
+            needed = count - len(pairs)
+            authors = self.popular(user_ids, k=needed)
+            readers = self.random.choices(user_ids, k=needed)
+            pairs.update(
+                (user_id, author_id)
+                for user_id, author_id in zip(readers, authors)
+                if user_id != author_id
+            )
+        pairs = sorted(pairs)
+        for i in range(0, len(pairs), self.batch_size):
+            self.insert(Follow, [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs[i:i + self.batch_size]
+            ])
+        self.follows_created = len(pairs)
+
+    def create_comments(self, count, user_ids, posts):
+        if not posts:
+            return
+        batch = []
+        for _ in range(count):
+            post_id, pub_date = self.random.choice(posts)
+            batch.append(Comment(
+                post_id=post_id,
+                author_id=self.random.choice(user_ids),
+                text=self.random.choice(self.texts),
+                created=pub_date + timedelta(
+                    seconds=self.random.expovariate(1 / 3600)),
+            ))
+            if len(batch) >= self.batch_size:
+                self.insert(Comment, batch)
+                batch = []
+        self.insert(Comment, batch)
+
+    def rebuild_derived(self, user_ids, posts):
+        """bulk_create не вызывает сигналы: счётчики и ленты
+        пересобираются по уже загруженным данным.
+        """
+        chunk = 500
+        with self.phase('счётчики'):
+            for i in range(0, len(posts), self.batch_size):
+                part = posts[i:i + self.batch_size]
+                with transaction.atomic():
+                    stats.rebuild_comments_count(part[0][0], part[-1][0])
+            user_ids = list(user_ids)
+            for i in range(0, len(user_ids), chunk):
+                with transaction.atomic():
+                    stats.rebuild(user_ids[i:i + chunk])
+        if not user_ids:
+            return
+        with self.phase('ленты'):
+            follower_ids = list(Follow.objects.filter(
+                user_id__gte=user_ids[0], user_id__lte=user_ids[-1]
+            ).order_by('user_id').values_list(
+                'user_id', flat=True).distinct())
+            for i in range(0, len(follower_ids), chunk):
+                timeline.rebuild_many(
+                    follower_ids[i:i + chunk], self.timeline_backfill)
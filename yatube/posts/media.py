@@ -0,0 +1,145 @@
+"""Файлы картинок постов: счётчик ссылок и удаление неиспользуемых.
+
+Хранилище core.storage.ContentAddressedStorage сохраняет одинаковые
+картинки один раз, поэтому файл можно удалить, только когда на него не
+ссылается ни один пост. Всё, что не удалилось сразу, находит сборщик
+мусора (команда collect_media_garbage).
+"""
+import os
+import posixpath
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core import thumbnails
+from . import versions
+from .models import Post
+
+
+def references(name):
+    """Сколько постов ссылается на файл (индекс posts_post_image)."""
+    return Post.objects.filter(image=name).count()
+
+
+def refresh_posts(name, **fields):
+    """Обновляет посты с картинкой name и сбрасывает их кеши."""
+    posts = list(Post.objects.filter(image=name).values_list(
+        'pk', 'author_id', 'group_id'))
+    if not posts:
+        return 0
+    Post.objects.filter(pk__in=[pk for pk, _, _ in posts]).update(
+        updated=timezone.now(), **fields)
+    for pk, author_id, group_id in posts:
+        versions.bump([
+            versions.post_version_key(pk),
+            *versions.post_version_keys(author_id, group_id),
+        ])
+    return len(posts)
+
+
+def delete(name):
+    """Удаляет файл, его миниатюры и записи о них в хранилище ключей."""
+    thumbnails.lookups.invalidate(name)
+    default.kvstore.delete(ImageFile(name, Post.image.field.storage))
+    Post.image.field.storage.delete(name)
+
+
+def release(name):
+    """После фиксации транзакции удаляет файл, если ссылок на него нет."""
+    if name:
+        transaction.on_commit(lambda: release_now(name))
+
+
+def release_now(name):
+    """Файл, сохранённый повторно за последние MEDIA_GRACE_PERIOD секунд,
+    не удаляется: его могла только что получить ещё не зафиксированная
+    транзакция. Такой файл потом удалит сборщик мусора.
+    """
+    if references(name):
+        return False
+    storage = Post.image.field.storage
+    try:
+        modified = os.path.getmtime(storage.path(name))
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT хранилищу не принадлежит.
+        return False
+    except OSError:
+        modified = 0
+    if time.time() - modified < settings.MEDIA_GRACE_PERIOD:
+        return False
+    delete(name)
+    return True
+
+
+def walk(directory):
+    """Файлы каталога directory внутри MEDIA_ROOT по одному: имя
+    относительно MEDIA_ROOT, размер и mtime. Список всего дерева в памяти
+    не собирается, только очередь непройденных каталогов.
+    """
+    root = Post.image.field.storage.location
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = posixpath.join(current, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield name, stat.st_size, stat.st_mtime
+
+
+def referenced_images(names):
+    """Имена из names, на которые ссылаются посты."""
+    return set(Post.objects.filter(image__in=names).values_list(
+        'image', flat=True))
+
+
+def referenced_thumbnails(names):
+    """Миниатюры из names, известные хранилищу ключей sorl.
+
+    Бэкенд находит миниатюру только через хранилище ключей, так что файл
+    без записи там никогда не будет показан.
+    """
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in names
+    }
+    return {
+        keys[key]
+        for key in KVStore.objects.filter(key__in=keys).values_list(
+            'key', flat=True)
+    }
+
+
+def thumbnails_directory():
+    return thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+
+
+class Throttle:
+    """Не больше rate операций в секунду; 0 — без ограничения."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next > now:
+            time.sleep(self.next - now)
+        self.next = max(self.next, now) + self.interval
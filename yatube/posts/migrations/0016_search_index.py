@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Полнотекстовые индексы SQLite FTS5. rowid строки индекса совпадает с
+# id поста или комментария; триггеры держат индекс в актуальном
+# состоянии при любых изменениях, в том числе через QuerySet.update().
+# Существующие строки индексирует команда build_search_index.
+TABLES = ('posts_post', 'posts_comment')
+
+CREATE = """
+CREATE VIRTUAL TABLE {table}_fts USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+    INSERT OR REPLACE INTO {table}_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER {table}_fts_update AFTER UPDATE OF text ON {table} BEGIN
+    DELETE FROM {table}_fts WHERE rowid = old.id;
+    INSERT INTO {table}_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+    DELETE FROM {table}_fts WHERE rowid = old.id;
+END;
+"""
+
+DROP = """
+DROP TRIGGER IF EXISTS {table}_fts_insert;
+DROP TRIGGER IF EXISTS {table}_fts_update;
+DROP TRIGGER IF EXISTS {table}_fts_delete;
+DROP TABLE IF EXISTS {table}_fts;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CREATE.format(table=table), DROP.format(table=table))
+        for table in TABLES
+    ]
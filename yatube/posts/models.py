@@ -2,9 +2,14 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
 
+from core.storage import content_storage
+from . import images
 
 User = get_user_model()
 
+IMAGE_INFO_FIELDS = (
+    'image_width', 'image_height', 'image_size', 'image_format')
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -13,6 +18,7 @@ class Post(models.Model):
     pub_date = models.DateTimeField('Дата публикации',
                                     auto_now_add=True
                                     )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
 
     author = models.ForeignKey(
         User,
@@ -32,17 +38,82 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
+    # Заполняются при сохранении картинки (posts.images), чтобы шаблонам
+    # и миниатюрам не приходилось открывать файл
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт', null=True, blank=True, editable=False)
+    image_format = models.CharField(
+        'Формат картинки', max_length=10, blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['pub_date'], name='posts_post_date'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='posts_post_author_date',
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='posts_post_group_date',
+            ),
+            models.Index(fields=['image'], name='posts_post_image'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:settings.SYMBOL_LIMIT]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        image_changed = (
+            self._state.adding
+            or self.get_loaded_value('image') != self._prepared_value('image')
+        )
+        if image_changed and (
+            update_fields is None or 'image' in update_fields
+        ):
+            images.apply(self, images.image_info(self.image))
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *IMAGE_INFO_FIELDS}
+        super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: self._prepared_value(field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+    def get_loaded_value(self, attname):
+        """Значение поля на момент загрузки из базы или последнего save()."""
+        loaded_values = getattr(self, '_loaded_values', {})
+        if attname in loaded_values:
+            return loaded_values[attname]
+        return self._prepared_value(attname)
+
+    def _prepared_value(self, attname):
+        field = self._meta.get_field(attname)
+        return field.get_prep_value(getattr(self, attname))
+
 
 class Group(models.Model):
     title = models.CharField('Название группы', max_length=200)
@@ -82,6 +153,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='posts_comment_post_created',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text
@@ -104,9 +181,129 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(fields=['author'], name='posts_follow_author'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 name="%(app_label)s_%(class)s_unique_relationships",
                 fields=['user', 'author'],
             ),
         ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                name="%(app_label)s_%(class)s_unique_post",
+                fields=['user', 'post'],
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='posts_timeline_user_date_post',
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField('Всего постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Всего подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        'Всего подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self) -> str:
+        return str(self.author)
+
+
+class BulkJob(models.Model):
+    """Фоновая задача над множеством объектов (posts.jobs)."""
+
+    DELETE_POSTS = 'delete_posts'
+    MOVE_POSTS = 'move_posts'
+    DELETE_USER = 'delete_user'
+    KINDS = (
+        (DELETE_POSTS, 'Удаление постов'),
+        (MOVE_POSTS, 'Перенос постов в группу'),
+        (DELETE_USER, 'Удаление пользователя'),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField('Вид', max_length=20, choices=KINDS)
+    description = models.CharField('Описание', max_length=200)
+    # JSON: id постов, новая группа, id пользователя
+    params = models.TextField('Параметры', default='{}')
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING)
+    # Место остановки: номер шага и id последнего обработанного объекта
+    step = models.PositiveIntegerField('Шаг', default=0)
+    cursor = models.PositiveIntegerField('Курсор', default=0)
+    processed = models.PositiveIntegerField('Обработано', default=0)
+    total = models.PositiveIntegerField('Всего', default=0)
+    batch_size = models.PositiveIntegerField('Размер части')
+    created_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Автор задачи'
+    )
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+    # Пока срок не истёк, задачу выполняет другой процесс
+    locked_until = models.DateTimeField(
+        'Занята до', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+
+    class Meta:
+        ordering = ('-pk',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status'], name='posts_bulkjob_status'),
+        ]
+
+    def __str__(self) -> str:
+        return self.description
@@ -0,0 +1,222 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import counters
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_token(*parts):
+    """Непрозрачный токен курсора: части через «|» в base64 для URL."""
+    raw = '|'.join(map(str, parts))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token, size):
+    """Части токена encode_token() строками; их должно быть size."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor(token)
+    if len(parts) != size:
+        raise InvalidCursor(token)
+    return parts
+
+
+def encode_cursor(direction, post):
+    """Непрозрачный токен позиции в ленте: направление + (pub_date, id)."""
+    return encode_token(direction, post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(token):
+    direction, pub_date, pk = decode_token(token, 3)
+    try:
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except ValueError:
+        raise InvalidCursor(token)
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        raise InvalidCursor(token)
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor, has_next,
+                 has_previous):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_cursor(self):
+        if self._has_next:
+            return encode_cursor(NEXT, self.object_list[-1])
+        return None
+
+    def previous_cursor(self):
+        if self._has_previous:
+            return encode_cursor(PREVIOUS, self.object_list[0])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) без COUNT(*) и OFFSET.
+
+    Стоимость страницы не зависит от её глубины: каждая страница — это
+    один запрос диапазона по индексу с LIMIT per_page + 1.
+    """
+
+    ordering = ('-pub_date', '-pk')
+
+    def fetch(self, direction, key, limit):
+        """До limit постов после позиции key = (pub_date, id) в
+        направлении direction; без key — с начала ленты. Посты идут в
+        порядке обхода: для PREVIOUS — от старых к новым.
+        """
+        queryset = self.object_list.order_by(*self.ordering)
+        if key is None:
+            return list(queryset[:limit])
+        pub_date, pk = key
+        if direction == NEXT:
+            return list(queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )[:limit])
+        return list(queryset.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+        ).order_by('pub_date', 'pk')[:limit])
+
+    def page(self, cursor=None):
+        limit = self.per_page + 1
+        if not cursor:
+            posts = self.fetch(NEXT, None, limit)
+            return CursorPage(
+                posts[:self.per_page], self, cursor,
+                has_next=len(posts) > self.per_page,
+                has_previous=False,
+            )
+        direction, pub_date, pk = decode_cursor(cursor)
+        posts = self.fetch(direction, (pub_date, pk), limit)
+        if direction == NEXT:
+            return CursorPage(
+                posts[:self.per_page], self, cursor,
+                has_next=len(posts) > self.per_page,
+                has_previous=True,
+            )
+        return CursorPage(
+            posts[:self.per_page][::-1], self, cursor,
+            has_next=True,
+            has_previous=len(posts) > self.per_page,
+        )
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+
+class FeedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация ленты, которая сама читает свои источники
+    (timeline.Feed), а не является QuerySet.
+    """
+
+    def fetch(self, direction, key, limit):
+        return self.object_list.fetch(direction, key, limit)
+
+
+class CountCheckedList(Sequence):
+    """Срез ленты, который при первом чтении сверяет число объектов с
+    ожидаемым по счётчику и при расхождении вызывает on_mismatch().
+
+    Пока фрагмент ленты берётся из кеша, срез не читается и запроса к
+    базе нет.
+    """
+
+    def __init__(self, queryset, expected, on_mismatch):
+        self.queryset = queryset
+        self.expected = expected
+        self.on_mismatch = on_mismatch
+
+    @cached_property
+    def items(self):
+        items = list(self.queryset)
+        if len(items) != self.expected:
+            self.on_mismatch()
+        return items
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт число постов ленты из кеша счётчиков.
+
+    Если закешированное число разошлось с базой, счётчик пересчитывается.
+    Последняя страница по счётчику и страницы вне диапазона проверяются
+    сразу: при завышенном счётчике они оказались бы пустыми. Остальные —
+    при чтении постов страницы, так что исправленное число увидят уже
+    следующие запросы.
+    """
+
+    def __init__(self, object_list, per_page, count_key):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+        self.count_source = None
+
+    @cached_property
+    def count(self):
+        count, self.count_source = counters.get_count(
+            self.count_key, self.object_list)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self._refresh_count():
+                raise
+        return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        posts = self.object_list[bottom:bottom + self.per_page]
+        expected = max(min(self.per_page, self.count - bottom), 0)
+        if number < self.num_pages:
+            posts = CountCheckedList(posts, expected, self._refresh_count)
+            return self._get_page(posts, number, self)
+        posts = list(posts)
+        if len(posts) != expected and self._refresh_count():
+            return self.get_page(number)
+        return self._get_page(posts, number, self)
+
+    def _refresh_count(self):
+        if self.count_source != 'cache':
+            return False
+        counters.invalidate(self.count_key)
+        self.__dict__.pop('count', None)
+        self.__dict__.pop('num_pages', None)
+        return True
@@ -0,0 +1,161 @@
+"""Полнотекстовый поиск по постам и комментариям (SQLite FTS5).
+
+Индексы posts_post_fts и posts_comment_fts ведут триггеры из миграции
+0016_search_index. Пост находится по своему тексту или по тексту
+комментариев; совпадения в комментариях весят меньше. Выдача
+упорядочена по релевантности bm25 и листается курсором (оценка, id)
+без OFFSET.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+from .paginator import InvalidCursor, decode_token, encode_token
+
+# Совпадение в комментарии считается вдвое менее релевантным (bm25
+# отрицателен: чем меньше, тем лучше).
+COMMENT_WEIGHT = 0.5
+
+WORD_RE = re.compile(r'\w+')
+
+SEARCH_SQL = """
+WITH matches AS (
+    SELECT rowid AS post_id, bm25(posts_post_fts) AS score
+    FROM posts_post_fts WHERE posts_post_fts MATCH %s
+    UNION ALL
+    SELECT comment.post_id, bm25(posts_comment_fts) * %s
+    FROM posts_comment_fts
+    JOIN posts_comment AS comment ON comment.id = posts_comment_fts.rowid
+    WHERE posts_comment_fts MATCH %s
+)
+SELECT post_id, MIN(score) AS best FROM matches
+GROUP BY post_id
+{after}
+ORDER BY best, post_id
+LIMIT %s
+"""
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательского ввода: все слова, последнее —
+    по префиксу. Синтаксис FTS5 во вводе не интерпретируется.
+    """
+    words = WORD_RE.findall(query.lower())
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def encode_cursor(score, pk):
+    return encode_token(repr(score), pk)
+
+
+def decode_cursor(token):
+    score, pk = decode_token(token, 2)
+    try:
+        return float(score), int(pk)
+    except ValueError:
+        raise InvalidCursor(token)
+
+
+class SearchPage:
+    """Страница выдачи: посты в порядке релевантности и курсор дальше."""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def search(query, per_page, cursor=None, queryset=None):
+    """Страница постов по запросу query, начиная после курсора cursor."""
+    expression = match_expression(query)
+    if not expression:
+        return SearchPage([], None)
+    params = [expression, COMMENT_WEIGHT, expression]
+    after = ''
+    if cursor:
+        after = 'HAVING (best, post_id) > (%s, %s)'
+        params.extend(decode_cursor(cursor))
+    with connection.cursor() as db:
+        db.execute(SEARCH_SQL.format(after=after), [*params, per_page + 1])
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    if queryset is None:
+        queryset = Post.objects.all()
+    posts = queryset.in_bulk([pk for pk, _ in rows])
+    return SearchPage(
+        [posts[pk] for pk, _ in rows if pk in posts], next_cursor)
+
+
+def matching(model, query):
+    """Условие pk__in по индексу модели — для админки и выборок."""
+    table = model._meta.db_table
+    if not match_expression(query):
+        return {'pk__in': []}
+    return {'pk__in': RawSQL(
+        f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s',
+        [match_expression(query)],
+    )}
+
+
+def rebuild(model, chunk_size, log=None):
+    """Заново индексирует таблицу модели частями по chunk_size строк.
+
+    Каждая часть — отдельная транзакция, так что запись в базу не
+    блокируется надолго. INSERT OR REPLACE не создаёт дублей с
+    записями, которые тем временем добавили триггеры.
+    """
+    table = model._meta.db_table
+    last_pk = indexed = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as db:
+            db.execute(
+                f'SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {table} '
+                f'WHERE id > %s ORDER BY id LIMIT %s)',
+                [last_pk, chunk_size],
+            )
+            max_pk, count = db.fetchone()
+            if not count:
+                break
+            db.execute(
+                f'INSERT OR REPLACE INTO {table}_fts(rowid, text) '
+                f'SELECT id, text FROM {table} WHERE id > %s AND id <= %s',
+                [last_pk, max_pk],
+            )
+            # Строки индекса, чьих постов или комментариев уже нет.
+            db.execute(
+                f'DELETE FROM {table}_fts WHERE rowid > %s AND rowid <= %s '
+                f'AND rowid NOT IN (SELECT id FROM {table} '
+                f'WHERE id > %s AND id <= %s)',
+                [last_pk, max_pk, last_pk, max_pk],
+            )
+        last_pk = max_pk
+        indexed += count
+        if log is not None:
+            log(f'{model._meta.verbose_name_plural}: {indexed}')
+    with connection.cursor() as db:
+        db.execute(f'DELETE FROM {table}_fts WHERE rowid > %s', [last_pk])
+        db.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('optimize')")
+    return indexed
+
+
+def rebuild_all(chunk_size, log=None):
+    return {
+        model: rebuild(model, chunk_size, log) for model in (Post, Comment)
+    }
@@ -0,0 +1,174 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import thumbnails
+from . import counters, images, media, stats, timeline, versions
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+PROFILE_FIELDS = ('username', 'first_name', 'last_name')
+# Ключей версий в одном обращении к кешу
+BUMP_CHUNK = 500
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Вход (update_fields=['last_login']) и смена пароля имени не меняют:
+    # ленты сбрасываются, только если имя действительно изменилось.
+    instance._name_changed = False
+    if instance.pk is None or (
+            update_fields is not None
+            and not set(PROFILE_FIELDS) & set(update_fields)):
+        return
+    old = User.objects.filter(pk=instance.pk).values_list(
+        *PROFILE_FIELDS).first()
+    instance._name_changed = old is not None and old != tuple(
+        getattr(instance, field) for field in PROFILE_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(author=instance)
+    elif getattr(instance, '_name_changed', False):
+        bump_user_pages(instance.pk)
+
+
+def bump_user_pages(user_id):
+    """Имя пользователя выводится в карточках его постов во всех лентах,
+    в профиле и в комментариях на страницах постов.
+    """
+    group_ids = Post.objects.filter(
+        author_id=user_id, group__isnull=False,
+    ).values_list('group_id', flat=True).distinct()
+    post_ids = Comment.objects.filter(author_id=user_id).values_list(
+        'post_id', flat=True).distinct()
+    keys = [
+        versions.feed_version_key(),
+        versions.feed_version_key(author_id=user_id),
+        versions.profile_version_key(user_id),
+        *(versions.feed_version_key(group_id=pk) for pk in group_ids),
+        *(versions.post_version_key(pk) for pk in post_ids),
+    ]
+    for i in range(0, len(keys), BUMP_CHUNK):
+        versions.bump(keys[i:i + BUMP_CHUNK])
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    versions.bump([
+        versions.post_version_key(instance.pk),
+        *versions.post_version_keys(instance.author_id, instance.group_id),
+    ])
+    old_image = instance.get_loaded_value('image')
+    if not created and old_image != instance.image.name:
+        thumbnails.lookups.invalidate(old_image)
+        media.release(old_image)
+    if instance.image and (created or old_image != instance.image.name):
+        thumbnails.schedule(instance.image.name)
+    if created:
+        counters.change(counters.post_count_keys(instance), 1)
+        stats.change(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+        return
+    old_group_id = instance.get_loaded_value('group_id')
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            counters.change(
+                [counters.feed_count_key(group_id=old_group_id)], -1)
+            versions.bump([versions.feed_version_key(group_id=old_group_id)])
+        if instance.group_id is not None:
+            counters.change(
+                [counters.feed_count_key(group_id=instance.group_id)], 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if instance.image:
+        thumbnails.lookups.invalidate(instance.image.name)
+        media.release(instance.image.name)
+    counters.change(counters.post_count_keys(instance), -1)
+    stats.change(instance.author_id, 'posts_count', -1)
+    versions.bump([
+        versions.post_version_key(instance.pk),
+        *versions.post_version_keys(instance.author_id, instance.group_id),
+    ])
+
+
+@receiver(thumbnails.thumbnails_generated)
+def post_thumbnails_generated(sender, name, original=None, **kwargs):
+    # Карточки и страницы, закешированные с оригиналом картинки,
+    # пересобираются уже с миниатюрой.
+    if original is None or original == name:
+        media.refresh_posts(name)
+        return
+    # Оригинал уменьшен и сохранён под новым именем: посты переходят на
+    # него, а прежний файл удаляется, когда на него не останется ссылок.
+    info = images.image_info(Post(image=name).image)
+    media.refresh_posts(
+        original, image=name,
+        image_width=info.width, image_height=info.height,
+        image_size=info.size, image_format=info.format,
+    )
+    media.release(original)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Название группы выводится в карточках общей ленты.
+    versions.bump([
+        versions.feed_version_key(),
+        versions.feed_version_key(group_id=instance.pk),
+    ])
+
+
+def bump_comment_feeds(comment):
+    post = Post.objects.filter(pk=comment.post_id).values(
+        'author_id', 'group_id').first()
+    if post is not None:
+        versions.bump(
+            versions.post_version_keys(post['author_id'], post['group_id']))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    versions.bump([versions.post_version_key(instance.post_id)])
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+        bump_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0))
+    versions.bump([versions.post_version_key(instance.post_id)])
+    bump_comment_feeds(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'followers_count', 1)
+        stats.change(instance.user_id, 'following_count', 1)
+        timeline.add_author(instance.user_id, instance.author_id)
+        versions.bump([
+            versions.profile_version_key(instance.author_id),
+            versions.profile_version_key(instance.user_id),
+        ])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, 'followers_count', -1)
+    stats.change(instance.user_id, 'following_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    timeline.check_fanout(instance.author_id)
+    versions.bump([
+        versions.profile_version_key(instance.author_id),
+        versions.profile_version_key(instance.user_id),
+    ])
@@ -0,0 +1,85 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post
+
+
+def compute(author_ids):
+    """Счётчики авторов, посчитанные по исходным таблицам."""
+    counts = {
+        author_id: {
+            'posts_count': 0, 'followers_count': 0, 'following_count': 0,
+        }
+        for author_id in author_ids
+    }
+    grouped = (
+        ('posts_count', Post.objects.filter(author_id__in=author_ids),
+         'author_id'),
+        ('followers_count', Follow.objects.filter(author_id__in=author_ids),
+         'author_id'),
+        ('following_count', Follow.objects.filter(user_id__in=author_ids),
+         'user_id'),
+    )
+    for field, queryset, key in grouped:
+        rows = queryset.order_by().values(key).annotate(total=Count('pk'))
+        for row in rows:
+            counts[row[key]][field] = row['total']
+    return counts
+
+
+def get_stats(author):
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        stats, _ = AuthorStats.objects.update_or_create(
+            author_id=author.pk, defaults=compute([author.pk])[author.pk])
+        author.stats = stats
+        return stats
+
+
+def followers_count(author_id):
+    count = AuthorStats.objects.filter(author_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    if count is None:
+        count = Follow.objects.filter(author_id=author_id).count()
+    return count
+
+
+def change(author_id, field, delta):
+    # Отсутствующая строка не создаётся здесь: её соберёт get_stats(),
+    # а при каскадном удалении пользователя она и не нужна.
+    # Счётчик, уже ушедший в 0, не нарушает CHECK при уменьшении.
+    AuthorStats.objects.filter(author_id=author_id).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def rebuild(author_ids, check=False):
+    """Сверяет и исправляет счётчики авторов; возвращает расхождения."""
+    counts = compute(author_ids)
+    existing = AuthorStats.objects.in_bulk(author_ids)
+    mismatched, missing = [], []
+    for author_id, expected in counts.items():
+        stats = existing.get(author_id)
+        if stats is None:
+            missing.append(AuthorStats(author_id=author_id, **expected))
+            continue
+        if any(getattr(stats, field) != value
+               for field, value in expected.items()):
+            for field, value in expected.items():
+                setattr(stats, field, value)
+            mismatched.append(stats)
+    if not check:
+        AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+        AuthorStats.objects.bulk_update(
+            mismatched,
+            ['posts_count', 'followers_count', 'following_count'],
+        )
+    return mismatched + missing
+
+
+def rebuild_comments_count(first_pk, last_pk):
+    comments = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    Post.objects.filter(pk__range=(first_pk, last_pk)).update(
+        comments_count=Coalesce(Subquery(comments), 0))
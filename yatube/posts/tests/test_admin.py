@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.admin import PostAdmin, estimated_count
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ScalableAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_rows(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author-{i}')
+            post = Post.objects.create(
+                author=author, text=f'Пост {i}', group=self.groups[i % 3])
+            Comment.objects.create(post=post, author=author, text='Ок')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_fixed_number_of_queries(self):
+        """Число запросов списка не зависит от числа строк"""
+        urls = [
+            reverse(f'admin:posts_{model}_changelist')
+            for model in ('post', 'comment', 'follow')
+        ]
+        self.create_rows(2)
+        few = [self.queries(url) for url in urls]
+        self.create_rows(10)
+        self.assertEqual([self.queries(url) for url in urls], few)
+
+    def test_stock_pagination_for_other_models(self):
+        """Списки без навигации по id сохраняют обычные номера страниц"""
+        Group.objects.bulk_create([
+            Group(title=f'Ещё группа {i}', slug=f'more-{i}', description='-')
+            for i in range(150)
+        ])
+        response = self.client.get(reverse('admin:posts_group_changelist'))
+        self.assertContains(response, '?p=1')
+        self.assertNotContains(response, 'Дальше →')
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, '?p=1')
+
+    def test_autocomplete_instead_of_choices(self):
+        """Редактируемая группа — автодополнение только с текущим значением
+        """
+        self.create_rows(1)
+        group = Post.objects.get().group
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'data-ajax--url')
+        self.assertContains(response, group.title)
+        for other in Group.objects.exclude(pk=group.pk):
+            self.assertNotContains(response, other.title)
+
+    @mock.patch.object(PostAdmin, 'list_per_page', 5)
+    def test_keyset_navigation(self):
+        """Следующая страница выбирается по id последней строки"""
+        self.create_rows(8)
+        url = reverse('admin:posts_post_changelist')
+        first = self.client.get(url).context['cl']
+        self.assertEqual(len(first.result_list), 5)
+        self.assertIsNotNone(first.keyset_next_url)
+        second = self.client.get(url + first.keyset_next_url).context['cl']
+        self.assertEqual(
+            [post.pk for post in second.result_list],
+            list(Post.objects.order_by('-pk').values_list(
+                'pk', flat=True)[5:]),
+        )
+        self.assertIsNone(second.keyset_next_url)
+
+    def test_estimated_count(self):
+        """Число строк без фильтров оценивается без COUNT(*)"""
+        self.create_rows(3)
+        with CaptureQueriesContext(connection) as context:
+            self.assertGreaterEqual(estimated_count(Post), 3)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in context.captured_queries))
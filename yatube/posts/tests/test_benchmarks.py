@@ -0,0 +1,59 @@
+from django.test import TestCase
+
+from .. import benchmarks
+from ..models import Follow
+
+VIEWS = [
+    'index', 'group_list', 'profile', 'follow_index', 'post_detail',
+    'post_create', 'add_comment', 'profile_follow', 'profile_unfollow',
+]
+
+
+class BenchmarksTest(TestCase):
+    def test_run_measures_every_view(self):
+        """Замеры покрывают все страницы posts и не меняют подписки"""
+        results, seeds = benchmarks.run([100], depths=[1, 2, 1000], repeat=2)
+        follows = Follow.objects.count()
+        cases = results['100']
+        self.assertNotIn('seed_yatube', cases)
+        seed = seeds['100']
+        self.assertGreater(seed['queries'], 0)
+        self.assertGreater(seed['sql_ms'], 0)
+        self.assertIn('ленты', seed['phases_ms'])
+        for view in VIEWS:
+            with self.subTest(view=view):
+                self.assertTrue(
+                    [name for name in cases if name.split('?')[0] == view])
+        self.assertIn('index?page=2', cases)
+        self.assertNotIn('index?page=1000', cases)
+        for name, result in cases.items():
+            with self.subTest(case=name):
+                self.assertIn(result['status'], (200, 302))
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertEqual(Follow.objects.count(), follows)
+
+    def test_compare_reports_regressions(self):
+        """Рост числа запросов и времени выше порога — регрессия"""
+        baseline = {'100': {'index': {
+            'p50_ms': 10, 'p95_ms': 20, 'queries': 3, 'sql_ms': 1,
+        }}}
+        results = {'100': {'index': {
+            'p50_ms': 11, 'p95_ms': 21, 'queries': 4, 'sql_ms': 2,
+        }}}
+        comparison = benchmarks.compare(results, baseline, threshold=0.2)
+        self.assertEqual(len(comparison), 1)
+        self.assertEqual(comparison[0]['regressions'], ['queries', 'sql_ms'])
+        self.assertEqual(comparison[0]['change']['p95_ms'], 0.05)
+
+    def test_compare_seeds(self):
+        """Наполнение сравнивается по общему времени и времени SQL"""
+        baseline = {'100': {
+            'total_ms': 100, 'queries': 30, 'sql_ms': 10, 'phases_ms': {},
+        }}
+        seeds = {'100': {
+            'total_ms': 150, 'queries': 30, 'sql_ms': 11, 'phases_ms': {},
+        }}
+        comparison = benchmarks.compare_seeds(seeds, baseline, threshold=0.2)
+        self.assertEqual(comparison[0]['case'], 'seed_yatube')
+        self.assertEqual(comparison[0]['regressions'], ['total_ms'])
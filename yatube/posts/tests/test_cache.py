@@ -2,7 +2,7 @@ from django.test import TestCase, Client
 from django.core.cache import cache
 from django.urls import reverse
 
-from ..models import Post, User
+from ..models import Comment, Group, Post, User
 
 
 class CacheTest(TestCase):
@@ -10,11 +10,24 @@ class CacheTest(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cache_slug',
+            description='Тестовое описание',
+        )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    def feed_urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+
     def test_cache_index_page(self):
         """Тест кеша главной страницы"""
         form_data = {
@@ -25,20 +38,67 @@ class CacheTest(TestCase):
             data=form_data,
             follow=True
         )
-        response_before_delete = self.authorized_client.get(
+        response_before_update = self.authorized_client.get(
             reverse('posts:index')
         )
-        Post.objects.all().delete()
-        response_after_delete = self.authorized_client.get(
+        # update() не отправляет сигналы: страница берётся из кеша.
+        Post.objects.update(text='Текст, изменённый в обход сигналов')
+        response_after_update = self.authorized_client.get(
             reverse('posts:index')
         )
         self.assertEqual(
-            response_before_delete.content, response_after_delete.content
+            response_before_update.content, response_after_update.content
         )
-        cache.clear()
-        response_after_clear_cache = self.authorized_client.get(
+        Post.objects.all().delete()
+        response_after_delete = self.authorized_client.get(
             reverse('posts:index')
         )
         self.assertNotEqual(
-            response_before_delete.content, response_after_clear_cache.content
+            response_before_update.content, response_after_delete.content
+        )
+
+    def test_feeds_show_changes_right_after_write(self):
+        """Новый пост и комментарий сразу видны во всех лентах"""
+        post = Post.objects.create(
+            text='Первый пост', author=self.user, group=self.group)
+        for url in self.feed_urls():
+            self.authorized_client.get(url)
+        new_post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        Comment.objects.create(post=post, author=self.user, text='Ответ')
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn(new_post.text, response.content.decode())
+                self.assertIn(
+                    'Комментариев: 1', response.content.decode())
+
+    def test_group_rename_updates_index(self):
+        """Переименование группы сразу видно на главной странице"""
+        Post.objects.create(
+            text='Пост в группе', author=self.user, group=self.group)
+        self.authorized_client.get(reverse('posts:index'))
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('Новое название', response.content.decode())
+
+    def test_post_edit_invalidates_only_its_card(self):
+        """Редактирование поста сбрасывает только его карточку"""
+        edited = Post.objects.create(
+            text='Редактируемый пост', author=self.user, group=self.group)
+        other = Post.objects.create(
+            text='Другой пост', author=self.user, group=self.group)
+        for url in self.feed_urls():
+            self.authorized_client.get(url)
+        Post.objects.filter(pk=other.pk).update(text='Не из кеша')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': edited.pk}),
+            data={'text': 'Отредактированный пост', 'group': self.group.pk},
         )
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                content = self.authorized_client.get(url).content.decode()
+                self.assertIn('Отредактированный пост', content)
+                self.assertIn('Другой пост', content)
+                self.assertNotIn('Не из кеша', content)
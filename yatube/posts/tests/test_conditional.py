@@ -0,0 +1,184 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='etag_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.author.username
+            }),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def revalidate(self, client, url, **headers):
+        # Страница с формой выдаёт CSRF-cookie, от которой зависит ETag.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        return etag, client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Неизменённые страницы отдают 304 без рендеринга шаблона"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag, response = self.revalidate(self.authorized_client, url)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.templates)
+                self.assertEqual(response.content, b'')
+
+    def test_writes_change_etag(self):
+        """Новый пост, комментарий и подписка меняют ETag страниц"""
+        etags = {
+            url: self.authorized_client.get(url)['ETag']
+            for url in self.urls()
+        }
+        Post.objects.create(
+            text='Новый пост', author=self.author, group=self.group)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        url = reverse('posts:profile', kwargs={
+            'username': self.author.username
+        })
+        etag = self.authorized_client.get(url)['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_page_follows_author_and_group(self):
+        """ETag поста меняется с числом постов и именем автора и с
+        названием группы
+        """
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        changes = [
+            lambda: Post.objects.create(
+                text='Другой пост', author=self.author),
+            lambda: self.rename(self.author),
+            lambda: Group.objects.get(pk=self.group.pk).save(),
+        ]
+        for change in changes:
+            etag, response = self.revalidate(self.authorized_client, url)
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+            change()
+            response = self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def rename(self, user, **names):
+        user = User.objects.get(pk=user.pk)
+        for field, name in (names or {'first_name': 'Новое'}).items():
+            setattr(user, field, name)
+        user.save()
+
+    def test_rename_changes_feeds_and_comments(self):
+        """Новое имя автора видно во всех лентах, а комментатора — на
+        странице поста, и прежний ETag не даёт 304
+        """
+        commenter = User.objects.create_user(username='Commenter')
+        Comment.objects.create(
+            post=self.post, author=commenter, text='Комментарий')
+        # Автор подписан в карточках полным именем, комментатор — логином.
+        cases = [(self.author, 'first_name', url) for url in self.urls()]
+        cases.append((
+            commenter, 'username',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ))
+        for i, (user, field, url) in enumerate(cases):
+            with self.subTest(url=url, field=field):
+                etag, response = self.revalidate(self.authorized_client, url)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.rename(user, **{field: f'Имя{i}'})
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, f'Имя{i}')
+
+    def test_login_keeps_feed_versions(self):
+        """Вход и сохранение без смены имени не сбрасывают ленты"""
+        url = reverse('posts:index')
+        etag, _ = self.revalidate(self.authorized_client, url)
+        user = User.objects.get(pk=self.author.pk)
+        user.set_password('new-password')
+        user.save()
+        self.authorized_client.force_login(self.user)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_depends_on_csrf_token(self):
+        """После смены CSRF-токена страница с формой отдаётся заново"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_user_and_page(self):
+        """ETag различается для пользователей и страниц ленты"""
+        url = reverse('posts:index')
+        self.assertNotEqual(
+            self.guest_client.get(url)['ETag'],
+            self.authorized_client.get(url)['ETag'],
+        )
+        self.assertNotEqual(
+            self.guest_client.get(url)['ETag'],
+            self.guest_client.get(url, {'page': 2})['ETag'],
+        )
+
+    def test_last_modified_for_guests(self):
+        """Гостям отдаётся Last-Modified, авторизованным — только ETag"""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(
+            self.authorized_client.get(url).has_header('Last-Modified'))
+
+    def test_missing_objects_have_no_etag(self):
+        """Для несуществующих группы, профиля и поста ETag не выдаётся"""
+        urls = [
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertFalse(response.has_header('ETag'))
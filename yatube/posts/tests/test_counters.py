@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import feed_count_key
+from ..models import Group, Post, User
+
+
+class FeedCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Counter')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='count_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(12)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return [
+            query['sql'] for query in context.captured_queries
+            if 'COUNT(' in query['sql'] and '"posts_post"' in query['sql']
+        ]
+
+    def test_feed_count_is_cached(self):
+        """Число постов ленты считается один раз и берётся из кеша"""
+        urls = {
+            reverse('posts:index'): feed_count_key(),
+            reverse('posts:group_list', kwargs={
+                'slug': self.group.slug
+            }): feed_count_key(group_id=self.group.pk),
+        }
+        for url, key in urls.items():
+            with self.subTest(url=url):
+                self.assertTrue(self.count_queries(url))
+                self.assertEqual(cache.get(key), 12)
+                self.assertFalse(self.count_queries(url))
+
+    def test_feed_count_changes_on_create_and_delete(self):
+        """Создание и удаление поста меняют закешированные счётчики"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        self.assertEqual(cache.get(feed_count_key()), 13)
+        self.assertEqual(
+            cache.get(feed_count_key(group_id=self.group.pk)), 13)
+        post.group = None
+        post.save()
+        self.assertEqual(
+            cache.get(feed_count_key(group_id=self.group.pk)), 12)
+        post.delete()
+        self.assertEqual(cache.get(feed_count_key()), 12)
+
+    def test_stale_count_is_recounted(self):
+        """Устаревший счётчик в кеше пересчитывается"""
+        cache.set(feed_count_key(), 3)
+        response = self.client.get(f"{reverse('posts:index')}?page=2")
+        page_obj = response.context.get('page_obj')
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj.object_list), 2)
+        self.assertEqual(cache.get(feed_count_key()), 12)
+
+    def test_cached_feed_page_reads_no_posts(self):
+        """Пока страница ленты в кеше, посты из базы не читаются"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse([
+            query['sql'] for query in context.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ])
+
+    def test_short_middle_page_is_recounted_after_render(self):
+        """Завышенный счётчик, из-за которого страница в середине ленты
+        оказалась неполной, исправляется для следующих запросов
+        """
+        cache.set(feed_count_key(), 30)
+        response = self.client.get(f"{reverse('posts:index')}?page=2")
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertEqual(cache.get(feed_count_key()), 12)
@@ -8,6 +8,7 @@ from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 
+from core.storage import content_storage
 from posts.models import Group, Post, User, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -104,7 +105,8 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.test_group.id,
-                image='posts/small.gif'
+                image=content_storage.content_name(
+                    'posts/small.gif', self.uploaded)
             ).exists()
         )
 
@@ -199,6 +201,30 @@ class PostFormTests(TestCase):
         self.assertEqual(change.author, self.user)
         self.assertTrue(change.pub_date, self.post.pub_date)
 
+    @override_settings(FILE_UPLOAD_MAX_BYTES=16)
+    def test_too_large_image_is_rejected(self):
+        """Файл больше лимита отклоняется до разбора картинки"""
+        posts_count = Post.objects.count()
+        response = self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большая картинка', 'image': self.uploaded},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 0 МБ.')
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1)
+    def test_too_many_pixels_are_rejected(self):
+        """Картинка с большим числом пикселей в заголовке отклоняется"""
+        posts_count = Post.objects.count()
+        response = self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Огромная картинка', 'image': self.uploaded},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0 мегапикселей.')
+        self.assertEqual(Post.objects.count(), posts_count)
+
 
 class CommentsTest(TestCase):
     @classmethod
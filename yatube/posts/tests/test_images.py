@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def gif(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageInfoTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.lookups.clear()
+
+    def assertImageInfo(self, post, width, height, size, image_format):
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_size,
+             post.image_format),
+            (width, height, size, image_format),
+        )
+
+    def test_info_is_saved_with_image(self):
+        """Размеры, вес и формат картинки сохраняются вместе с постом"""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=gif())
+        self.assertImageInfo(post, 2, 1, len(SMALL_GIF), 'GIF')
+        post.image = None
+        post.save()
+        self.assertImageInfo(post, None, None, None, '')
+
+    def test_broken_image_leaves_info_empty(self):
+        """Нечитаемый файл не мешает сохранить пост"""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=SimpleUploadedFile(
+                name='broken.gif', content=b'not an image'))
+        self.assertImageInfo(post, None, None, None, '')
+
+    def test_backfill_command(self):
+        """Команда заполняет сведения о картинках по частям"""
+        posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=self.user, image=gif())
+            for i in range(3)
+        ]
+        Post.objects.update(
+            image_width=None, image_height=None, image_size=None,
+            image_format='')
+        out = StringIO()
+        call_command('backfill_image_info', chunk_size=2, stdout=out)
+        self.assertIn('Обработано постов: 2', out.getvalue())
+        self.assertIn('Сведения о картинках обновлены: 3', out.getvalue())
+        for post in posts:
+            self.assertImageInfo(post, 2, 1, len(SMALL_GIF), 'GIF')
+
+    def test_original_has_stored_dimensions(self):
+        """Пока миниатюр нет, оригинал выводится с размерами из базы"""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=gif())
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(
+            response, f'src="{post.image.url}" width="2" height="1"')
+
+    @override_settings(IMAGE_MAX_SIDE=10)
+    def test_oversized_original_is_downscaled(self):
+        """Воркер уменьшает большой оригинал и обновляет его размеры"""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+        post = Post.objects.create(
+            text='Большая картинка', author=self.user,
+            image=SimpleUploadedFile('big.png', buffer.getvalue()),
+        )
+        self.assertImageInfo(post, 40, 20, len(buffer.getvalue()), 'PNG')
+        original = post.image.name
+        self.assertTrue(thumbnails.generate(original))
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (10, 5))
+        self.assertEqual(post.image_size, post.image.size)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (10, 5))
+        self.assertFalse(thumbnails.downscale(post.image.name))
+        # Уменьшенный файл назван по своему содержимому, оригинал цел.
+        self.assertNotEqual(post.image.name, original)
+        self.assertEqual(
+            post.image.name,
+            post.image.storage.content_name(original, post.image.file))
+        with Image.open(post.image.storage.path(original)) as image:
+            self.assertEqual(image.size, (40, 20))
@@ -0,0 +1,211 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import jobs
+from ..models import (AuthorStats, BulkJob, Comment, Follow, Group, Post,
+                      TimelineEntry, User)
+
+
+@override_settings(BULK_JOB_BATCH_SIZE=2, BULK_JOB_PAUSE=0)
+class BulkJobTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+
+    def create_posts(self, count, author=None):
+        return [
+            Post.objects.create(text=f'Пост {i}', author=author or self.author)
+            for i in range(count)
+        ]
+
+    def test_delete_posts_in_batches(self):
+        """Посты удаляются частями после своих записей лент и
+        комментариев, сигналы поправляют статистику
+        """
+        posts = self.create_posts(5)
+        Comment.objects.create(post=posts[0], author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        entries = TimelineEntry.objects.filter(user=self.reader).count()
+        self.assertEqual(entries, 5)
+        job = jobs.delete_posts(Post.objects.all())
+        self.assertEqual(job.total, 5 + 1 + entries)
+        with mock.patch.object(
+            jobs.Step, 'apply', autospec=True, side_effect=jobs.Step.apply,
+        ) as apply:
+            self.assertTrue(jobs.run(job))
+        self.assertEqual(
+            [call.args[0].model for call in apply.call_args_list],
+            [TimelineEntry] * 3 + [Comment] + [Post] * 3)
+        job.refresh_from_db()
+        self.assertEqual(job.status, BulkJob.DONE)
+        self.assertEqual(job.processed, 11)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).posts_count, 0)
+
+    def test_failed_job_resumes_where_it_stopped(self):
+        """Прерванная задача продолжается с курсора"""
+        self.create_posts(5)
+        job = jobs.delete_posts(Post.objects.all())
+        calls = []
+
+        def fail_second(step, pks):
+            calls.append(pks)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            jobs.delete(step.model, pks)
+
+        with mock.patch.object(jobs.Step, 'apply', fail_second), \
+                self.assertLogs('posts.jobs', 'ERROR'):
+            self.assertFalse(jobs.run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, BulkJob.FAILED)
+        self.assertEqual(job.processed, 2)
+        self.assertEqual(Post.objects.count(), 3)
+        jobs.resume(job)
+        self.assertTrue(jobs.run(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (BulkJob.DONE, 5))
+        self.assertFalse(Post.objects.exists())
+
+    def test_claimed_job_is_not_run_twice(self):
+        """Задачу, которую выполняет другой процесс, не берут"""
+        self.create_posts(1)
+        job = jobs.delete_posts(Post.objects.all())
+        self.assertTrue(jobs.claim(job))
+        self.assertFalse(jobs.run(job))
+        self.assertNotIn(job, jobs.unfinished())
+        self.assertTrue(Post.objects.exists())
+
+    def test_move_posts(self):
+        """Перенос в группу идёт через save() и меняет дату изменения"""
+        posts = self.create_posts(3)
+        job = jobs.move_posts(Post.objects.all(), self.group)
+        jobs.run(job)
+        self.assertEqual(self.group.posts.count(), 3)
+        self.assertGreater(
+            Post.objects.get(pk=posts[0].pk).updated, posts[0].updated)
+
+    def test_delete_user_with_content(self):
+        """Пользователь удаляется вместе с постами, комментариями,
+        подписками и лентами
+        """
+        user = User.objects.create_user(username='Prolific')
+        posts = self.create_posts(3, author=user)
+        Comment.objects.create(post=posts[0], author=self.reader, text='Ок')
+        Comment.objects.create(
+            post=Post.objects.create(text='Чужой', author=self.author),
+            author=user, text='Ок')
+        Follow.objects.create(user=self.reader, author=user)
+        Follow.objects.create(user=user, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        job = jobs.delete_user(user)
+        self.assertFalse(User.objects.get(pk=user.pk).is_active)
+        self.assertTrue(jobs.run(job))
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(Post.objects.filter(author_id=user.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 0)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.reader).following_count, 0)
+
+    def test_command_runs_unfinished_jobs(self):
+        """run_bulk_jobs выполняет новые и брошенные задачи"""
+        self.create_posts(3)
+        jobs.delete_posts(Post.objects.all())
+        out = StringIO()
+        call_command('run_bulk_jobs', stdout=out)
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+class BulkJobAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(3)
+        ]
+
+    def post_action(self, action, **data):
+        return self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': action,
+            '_selected_action': [post.pk for post in self.posts],
+            **data,
+        }, follow=True)
+
+    def test_delete_selected_creates_job(self):
+        """Подтверждение показывает число объектов, удаление — задача"""
+        response = self.post_action('delete_selected')
+        self.assertContains(response, 'Посты: 3')
+        response = self.post_action('delete_selected', post='yes')
+        job = BulkJob.objects.get()
+        self.assertEqual(job.kind, BulkJob.DELETE_POSTS)
+        self.assertEqual(job.description, 'Удаление постов: 3')
+        self.assertContains(response, 'Выполняется в фоне')
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_move_to_group_creates_job(self):
+        """Перенос постов в группу ставится задачей"""
+        self.post_action('move_to_group', group=self.group.pk)
+        job = BulkJob.objects.get()
+        self.assertEqual(job.kind, BulkJob.MOVE_POSTS)
+        self.assertEqual(job.total, 3)
+
+    def test_delete_user_creates_job(self):
+        """Удаление пользователя отключает его и ставит задачу"""
+        url = reverse('admin:auth_user_delete', args=[self.author.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Посты: 3')
+        response = self.client.post(url, {'post': 'yes'})
+        self.assertRedirects(response, reverse('admin:auth_user_changelist'))
+        job = BulkJob.objects.get()
+        self.assertEqual(job.kind, BulkJob.DELETE_USER)
+        self.assertEqual(job.description, 'Удаление пользователя Author')
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_deletion_requires_permissions_for_every_step(self):
+        """Без права удалять комментарии посты не удалить; для записей
+        лент, у которых нет админки, права не нужны
+        """
+        moderator = User.objects.create_user(
+            username='moderator', is_staff=True)
+        moderator.user_permissions.set(Permission.objects.filter(
+            codename__in=['view_post', 'delete_post']))
+        self.client.force_login(moderator)
+        url = reverse('admin:posts_post_delete', args=[self.posts[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.context['perms_lacking'], {'Комментарий'})
+        response = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        response = self.post_action('delete_selected', post='yes')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(BulkJob.objects.exists())
+        moderator.user_permissions.add(
+            Permission.objects.get(codename='delete_comment'))
+        response = self.client.get(url)
+        self.assertFalse(response.context['perms_lacking'])
+        self.post_action('delete_selected', post='yes')
+        self.assertEqual(BulkJob.objects.get().kind, BulkJob.DELETE_POSTS)
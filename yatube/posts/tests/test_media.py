@@ -0,0 +1,170 @@
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import thumbnails
+from core.storage import content_name_re
+from posts import media
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def gif(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'),
+                      ignore_errors=True)
+
+    def create_post(self, image):
+        return Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=image)
+
+    def stored_files(self):
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        return [
+            os.path.relpath(os.path.join(root, name), TEMP_MEDIA_ROOT)
+            for root, _, names in os.walk(directory) for name in names
+        ]
+
+    def test_identical_uploads_are_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом в шардах по хешу"""
+        first = self.create_post(gif('first.gif'))
+        second = self.create_post(gif('SECOND.GIF'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, content_name_re('posts'))
+        self.assertEqual(self.stored_files(), [first.image.name])
+        self.assertEqual(media.references(first.image.name), 2)
+
+    def test_file_is_released_without_references(self):
+        """Файл удаляется, только когда на него не ссылается ни один пост
+        и он не сохранялся заново в течение MEDIA_GRACE_PERIOD
+        """
+        first = self.create_post(gif())
+        second = self.create_post(gif())
+        name = first.image.name
+        os.utime(first.image.path, (0, 0))
+        first.delete()
+        self.assertFalse(media.release_now(name))
+        self.assertTrue(first.image.storage.exists(name))
+        second.delete()
+        self.create_post(gif()).delete()
+        self.assertFalse(media.release_now(name))
+        os.utime(first.image.path, (0, 0))
+        self.assertTrue(media.release_now(name))
+        self.assertFalse(first.image.storage.exists(name))
+
+    def test_migrate_media_storage_command(self):
+        """Команда переносит старые файлы в хранилище по хешу и склеивает
+        одинаковые
+        """
+        legacy = FileSystemStorage()
+        names = [
+            legacy.save('posts/one.gif', ContentFile(SMALL_GIF)),
+            legacy.save('posts/two.gif', ContentFile(SMALL_GIF)),
+        ]
+        posts = [self.create_post(None) for _ in names]
+        for post, name in zip(posts, names):
+            Post.objects.filter(pk=post.pk).update(image=name)
+        out = StringIO()
+        call_command('migrate_media_storage', chunk_size=1, stdout=out)
+        self.assertIn(
+            'Перенесено: 1, совпали с существующими: 1, не найдено: 0',
+            out.getvalue())
+        images = set(Post.objects.filter(
+            pk__in=[post.pk for post in posts]).values_list(
+                'image', flat=True))
+        self.assertEqual(len(images), 1)
+        name = images.pop()
+        self.assertTrue(re.match(content_name_re('posts'), name))
+        self.assertEqual(self.stored_files(), [name])
+
+    def age(self, name, seconds=2 * 60 * 60):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        old = os.path.getmtime(path) - seconds
+        os.utime(path, (old, old))
+
+    def test_collect_media_garbage(self):
+        """Сборщик удаляет старые файлы без ссылок вместе с миниатюрами,
+        свежие и используемые файлы остаются
+        """
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'cache'),
+                      ignore_errors=True)
+        storage = FileSystemStorage()
+        post = self.create_post(gif())
+        thumbnails.generate(post.image.name)
+        kept_thumbnails = [name for name, _, _ in media.walk('cache')]
+        png = BytesIO()
+        Image.new('RGB', (4, 2), 'blue').save(png, 'PNG')
+        deleted = self.create_post(SimpleUploadedFile('deleted.png',
+                                                      png.getvalue()))
+        thumbnails.generate(deleted.image.name)
+        deleted_thumbnails = [
+            name for name, _, _ in media.walk('cache')
+            if name not in kept_thumbnails
+        ]
+        deleted.delete()
+        orphan = Post.image.field.storage.save(
+            'posts/orphan.txt', ContentFile(b'orphan'))
+        recent = Post.image.field.storage.save(
+            'posts/recent.txt', ContentFile(b'recent'))
+        stray_thumbnail = storage.save('cache/aa/bb/stray.jpg',
+                                       ContentFile(b'stray'))
+        for name in [post.image.name, deleted.image.name, orphan,
+                     stray_thumbnail, *kept_thumbnails, *deleted_thumbnails]:
+            self.age(name)
+
+        out = StringIO()
+        call_command('collect_media_garbage', dry_run=True, stdout=out)
+        self.assertIn(orphan, out.getvalue())
+        self.assertIn(stray_thumbnail, out.getvalue())
+        self.assertIn('Будет удалено: 3', out.getvalue())
+        self.assertTrue(storage.exists(orphan))
+
+        call_command('collect_media_garbage', rate=0, stdout=StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertFalse(storage.exists(stray_thumbnail))
+        self.assertFalse(storage.exists(deleted.image.name))
+        self.assertTrue(deleted_thumbnails)
+        for name in deleted_thumbnails:
+            self.assertFalse(storage.exists(name))
+        self.assertTrue(storage.exists(recent))
+        self.assertTrue(storage.exists(post.image.name))
+        for name in kept_thumbnails:
+            self.assertTrue(storage.exists(name))
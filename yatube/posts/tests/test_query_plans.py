@@ -0,0 +1,109 @@
+import re
+import unittest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..paginator import NEXT, PREVIOUS, encode_cursor
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+( AS \w+)?$')
+SORT = 'USE TEMP B-TREE FOR'
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Planner')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='plan_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        posts = []
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+            Comment.objects.create(
+                post=post, author=cls.user, text=f'Комментарий {i}')
+            posts.append(post)
+        cls.first_post, cls.post = posts[0], posts[-1]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def collect_statements(self, url):
+        statements = []
+
+        def collect(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            self.client.get(url)
+        return [
+            (sql, params) for sql, params in statements
+            if sql.startswith('SELECT') and '"posts_' in sql
+        ]
+
+    def query_plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_uses_indexes(self, url):
+        for sql, params in self.collect_statements(url):
+            plan = self.query_plan(sql, params)
+            with self.subTest(url=url, sql=sql, plan=plan):
+                self.assertFalse(
+                    [step for step in plan if FULL_SCAN.match(step)])
+                self.assertFalse([step for step in plan if SORT in step])
+
+    def test_posts_views_use_indexes(self):
+        """Запросы лент и страниц постов не сканируют таблицы и не
+        сортируют результат во временном B-дереве
+        """
+        urls = [
+            reverse('posts:index'),
+            f"{reverse('posts:index')}?cursor=",
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            f"{reverse('posts:group_list', kwargs={'slug': self.group.slug})}"
+            '?cursor=',
+            reverse('posts:profile', kwargs={
+                'username': self.author.username
+            }),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            self.assert_uses_indexes(url)
+
+    def follow_urls(self):
+        url = reverse('posts:follow_index')
+        return [
+            url,
+            f'{url}?page=2',
+            f'{url}?cursor=',
+            f'{url}?cursor={encode_cursor(NEXT, self.post)}',
+            f'{url}?cursor={encode_cursor(PREVIOUS, self.first_post)}',
+        ]
+
+    def test_follow_feed_reads_timeline_index(self):
+        """Лента подписок читает диапазон индекса ленты пользователя без
+        сортировки
+        """
+        for url in self.follow_urls():
+            self.assert_uses_indexes(url)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_feed_reads_pulled_authors_by_index(self):
+        """Посты «тяжёлых» авторов читаются диапазоном индекса автора"""
+        for url in self.follow_urls():
+            self.assert_uses_indexes(url)
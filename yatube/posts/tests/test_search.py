@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        cls.in_text = Post.objects.create(
+            author=cls.user, text='Сегодня вязали шарфы из шерсти')
+        cls.in_comment = Post.objects.create(
+            author=cls.user, text='Фотографии с выставки')
+        Comment.objects.create(
+            post=cls.in_comment, author=cls.user,
+            text='Похоже на шарфы моей бабушки')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Рецепт яблочного пирога')
+
+    def found(self, query, per_page=10):
+        return list(search.search(query, per_page))
+
+    def test_ranked_posts_and_comments(self):
+        """Пост находится по тексту и по комментариям, совпадение в
+        тексте поста выше
+        """
+        self.assertEqual(self.found('шарфы'), [self.in_text, self.in_comment])
+        self.assertEqual(self.found('ШАРФ'), [self.in_text, self.in_comment])
+        self.assertEqual(self.found('пирога'), [self.other])
+        self.assertEqual(self.found(''), [])
+
+    def test_user_input_is_not_query_syntax(self):
+        """Кавычки и операторы FTS5 во вводе не ломают запрос"""
+        self.assertEqual(self.found('шарфы" OR (пирога'), [])
+        self.assertEqual(self.found('(вязали*'), [self.in_text])
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при update() и удалении"""
+        Post.objects.filter(pk=self.other.pk).update(text='Шарфы и пирог')
+        self.assertIn(self.other, self.found('шарфы'))
+        self.assertEqual(self.found('яблочного'), [])
+        Post.objects.filter(pk=self.in_text.pk).delete()
+        self.assertNotIn(self.in_text, self.found('шарфы'))
+
+    def test_keyset_pages(self):
+        """Страницы выдачи идут без повторов и пропусков"""
+        for i in range(5):
+            Post.objects.create(author=self.user, text=f'Шарфы, выпуск {i}')
+        found, cursor = [], None
+        while True:
+            page = search.search('шарфы', 2, cursor)
+            found.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(found), 7)
+        self.assertEqual(len(set(found)), 7)
+
+    def test_build_command(self):
+        """Команда заново индексирует существующие тексты частями"""
+        with connection.cursor() as db:
+            db.execute('DELETE FROM posts_post_fts')
+            db.execute('DELETE FROM posts_comment_fts')
+        self.assertEqual(self.found('шарфы'), [])
+        out = StringIO()
+        call_command('build_search_index', chunk_size=2, stdout=out)
+        self.assertIn('Посты — 3', out.getvalue())
+        self.assertEqual(self.found('шарфы'), [self.in_text, self.in_comment])
+
+    def test_search_view(self):
+        """Страница поиска показывает найденные посты"""
+        response = self.client.get(reverse('posts:search'), {'q': 'шарфы'})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.in_text, self.in_comment])
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'шарфы', 'cursor': 'мусор'})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по полнотекстовому индексу"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пирога'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other])
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'бабушки'})
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (
+    AuthorStats, Comment, Follow, Group, Post, TimelineEntry, User,
+)
+
+
+class SeedYatubeTest(TestCase):
+    options = {
+        'users': 30,
+        'posts': 120,
+        'follows': 60,
+        'comments': 80,
+        'groups': 3,
+        'seed': 7,
+        'until': '2022-01-31',
+        'batch_size': 50,
+    }
+
+    def seed(self):
+        call_command('seed_yatube', stdout=StringIO(), **self.options)
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'pub_date')),
+            Follow.objects.count(),
+            list(Comment.objects.order_by('pk').values_list(
+                'post__text', 'created')),
+        )
+
+    def test_seed_creates_requested_data(self):
+        """Команда создаёт заданное число объектов и пересчитывает
+        производные данные
+        """
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertLessEqual(Follow.objects.count(), 60)
+        author = Post.objects.values('author').order_by('author').first()
+        stats = AuthorStats.objects.get(author_id=author['author'])
+        self.assertEqual(
+            stats.posts_count,
+            Post.objects.filter(author_id=author['author']).count())
+        post = Comment.objects.first().post
+        self.assertEqual(post.comments_count, post.comments.count())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user).count())
+
+    def test_seed_is_deterministic(self):
+        """Одинаковые --seed и --until дают одинаковые данные"""
+        first = self.seed()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(self.seed(), first)
+
+    def test_seed_reports_timings(self):
+        """Команда сообщает время каждого этапа, включая пересборку лент"""
+        out = StringIO()
+        call_command('seed_yatube', stdout=out, **self.options)
+        self.assertIn('Время, с: пользователи', out.getvalue())
+        self.assertIn('ленты', out.getvalue())
+
+    def test_timeline_backfill_is_capped(self):
+        """--timeline-backfill ограничивает число постов подписки в ленте"""
+        call_command(
+            'seed_yatube', stdout=StringIO(),
+            **{**self.options, 'timeline_backfill': 1})
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=follow.user, post__author=follow.author).count(),
+            1)
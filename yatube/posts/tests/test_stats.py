@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post, User
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_posts_and_subscriptions(self):
+        """Счётчики меняются при создании и удалении постов и подписок"""
+        post = Post.objects.create(text='Ещё пост', author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        post.delete()
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_drifted_counters_do_not_go_below_zero(self):
+        """Удаление при счётчике, уже ушедшем в 0, не нарушает CHECK"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Ок')
+        AuthorStats.objects.update(
+            posts_count=0, followers_count=0, following_count=0)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        comment.delete()
+        follow.delete()
+        Post.objects.get(pk=self.post.pk).delete()
+        author_stats = self.stats(self.author)
+        self.assertEqual(
+            (author_stats.posts_count, author_stats.followers_count), (0, 0))
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_profile_uses_stored_counters(self):
+        """Профиль выводит счётчики без подсчёта по таблицам"""
+        url = reverse('posts:profile', kwargs={
+            'username': self.author.username
+        })
+        self.reader_client.get(url)
+        # Сессия читается из кеша (core.sessions); один из запросов —
+        # поиск id автора для ETag (posts.conditional).
+        with self.assertNumQueries(5):
+            response = self.reader_client.get(url)
+        self.assertEqual(response.context['author_stats'].posts_count, 1)
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_missing_stats_are_rebuilt_on_read(self):
+        """Отсутствующая статистика собирается при первом чтении"""
+        AuthorStats.objects.filter(author=self.author).delete()
+        response = self.reader_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.context['author_stats'].posts_count, 1)
+        self.assertTrue(
+            AuthorStats.objects.filter(author=self.author).exists())
+
+    def test_rebuild_command(self):
+        """Команда rebuild_author_stats находит и исправляет расхождения"""
+        AuthorStats.objects.filter(author=self.author).update(posts_count=7)
+        out = StringIO()
+        call_command('rebuild_author_stats', '--check', stdout=out)
+        self.assertIn(f'author_id={self.author.pk}', out.getvalue())
+        self.assertEqual(self.stats(self.author).posts_count, 7)
+        call_command('rebuild_author_stats', '--chunk-size=1', stdout=out)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core import tasks, thumbnails
+from core.models import Task
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.lookups.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+
+    def image_sources(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        return response.content.decode()
+
+    def test_original_until_thumbnail_is_ready(self):
+        """До создания миниатюры страница показывает оригинал,
+        после — миниатюру
+        """
+        self.assertIn(self.post.image.url, self.image_sources())
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        content = self.image_sources()
+        self.assertNotIn(self.post.image.url, content)
+        self.assertIn(f'{settings.MEDIA_URL}cache/', content)
+
+    def test_generation_is_queued_once(self):
+        """Сохранение картинки ставит одну задачу, промахи бэкенда на
+        странице новых не добавляют; задачу выполняет воркер
+        """
+        self.image_sources()
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'core.thumbnails.generate')
+        self.assertEqual(task.args, f'["{self.post.image.name}"]')
+        tasks.work(once=True)
+        self.assertFalse(Task.objects.exists())
+        self.assertNotIn(self.post.image.url, self.image_sources())
+
+    def test_generation_refreshes_cached_cards(self):
+        """Создание миниатюры обновляет дату изменения поста"""
+        updated = self.post.updated
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.updated, updated)
+
+    def test_missing_source_is_not_rescheduled(self):
+        """Отсутствующий файл помечается и не ставится в очередь снова"""
+        with self.assertLogs('sorl.thumbnail', 'WARNING'):
+            self.assertFalse(thumbnails.generate('posts/missing.gif'))
+        self.assertTrue(
+            cache.get(f'{thumbnails.FAILED_KEY_PREFIX}:posts/missing.gif'))
+
+    def test_backfill_command(self):
+        """Команда создаёт миниатюры для всех картинок постов"""
+        out = StringIO()
+        call_command('generate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Миниатюры созданы: 1, ошибок: 0', out.getvalue())
+        self.assertNotIn(self.post.image.url, self.image_sources())
+
+    @override_settings(
+        THUMBNAIL_RESPONSIVE_WIDTHS=[320, 960],
+        THUMBNAIL_RESPONSIVE_FORMATS=['PNG', 'JPEG'],
+    )
+    def test_responsive_variants(self):
+        """Карточка ссылается на варианты всех ширин и форматов, размеры
+        картинки указаны в разметке
+        """
+        thumbnails.generate(self.post.image.name)
+        content = self.image_sources()
+        self.assertRegex(
+            content, r'<source type="image/png" '
+                     r'srcset="\S+\.png 320w, \S+\.png 960w"')
+        self.assertRegex(content, r'srcset="\S+\.jpg 320w, \S+\.jpg 960w"')
+        self.assertIn('width="960" height="339" loading="lazy"', content)
+
+    @override_settings(THUMBNAIL_RESPONSIVE_FORMATS=['UNKNOWN', 'JPEG'])
+    def test_unsupported_formats_are_skipped(self):
+        """Форматы, которые не умеет Pillow, не создаются"""
+        self.assertEqual(
+            {variant.format for variant in thumbnails.variants()}, {'JPEG'})
+        thumbnails.generate(self.post.image.name)
+        self.assertNotIn('<source', self.image_sources())
+
+    def test_lookups_are_served_from_process_lru(self):
+        """Повторный поиск готовой миниатюры не идёт в хранилище ключей,
+        попадания видны в Server-Timing
+        """
+        thumbnails.generate(self.post.image.name)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        first = self.client.get(url)['Server-Timing']
+        second = self.client.get(url)['Server-Timing']
+        variants = len(thumbnails.variants())
+        self.assertIn(f'0 lru hits, {variants} lru misses', first)
+        self.assertIn(f'{variants} lru hits, 0 lru misses', second)
+        self.assertEqual(len(thumbnails.lookups), variants)
+
+    def test_image_change_invalidates_lru(self):
+        """Смена и удаление картинки убирают её миниатюры из LRU"""
+        thumbnails.generate(self.post.image.name)
+        self.image_sources()
+        self.assertTrue(thumbnails.lookups)
+        other = BytesIO()
+        Image.new('RGB', (4, 2), 'blue').save(other, 'PNG')
+        self.post.image = SimpleUploadedFile('other.png', other.getvalue())
+        self.post.save()
+        self.assertEqual(len(thumbnails.lookups), 0)
+        thumbnails.generate(self.post.image.name)
+        self.image_sources()
+        self.assertTrue(thumbnails.lookups)
+        self.post.delete()
+        self.assertEqual(len(thumbnails.lookups), 0)
+
+    @override_settings(THUMBNAIL_LRU_SIZE=2)
+    def test_lru_is_bounded(self):
+        """LRU вытесняет давно не читавшиеся записи"""
+        lookups = thumbnails.LookupCache()
+        for name in ('a', 'b', 'c'):
+            lookups.set((name, '960x339', '{}'), name)
+        self.assertIsNone(lookups.get(('a', '960x339', '{}')))
+        self.assertEqual(lookups.get(('c', '960x339', '{}')), 'c')
+        self.assertEqual(len(lookups), 2)
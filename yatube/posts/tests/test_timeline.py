@@ -0,0 +1,154 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import tasks
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+from ..paginator import FeedCursorPaginator
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.stranger = User.objects.create_user(username='Stranger')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def feed_texts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context.get('page_obj')]
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+
+    def test_follow_copies_existing_posts(self):
+        """Подписка переносит посты автора в ленту подписчика"""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.feed_texts(), [self.old_post.text])
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост автора попадает в ленты подписчиков"""
+        self.follow()
+        self.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Свежий пост'})
+        self.assertEqual(
+            self.feed_texts(), ['Свежий пост', self.old_post.text])
+        Post.objects.create(text='Чужой пост', author=self.stranger)
+        self.assertNotIn('Чужой пост', self.feed_texts())
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты авторов с большим числом подписчиков читаются напрямую"""
+        self.follow()
+        Post.objects.create(text='Пост популярного автора', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            self.feed_texts(),
+            ['Пост популярного автора', self.old_post.text]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_feed_merges_timeline_and_pulled_posts(self):
+        """Записи ленты и посты «тяжёлых» авторов сливаются по дате и при
+        листании по номерам, и курсором
+        """
+        popular = User.objects.create_user(username='Popular')
+        Follow.objects.create(user=self.stranger, author=popular)
+        Follow.objects.create(user=self.reader, author=popular)
+        self.follow()
+        for i in range(2):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            Post.objects.create(text=f'Популярный {i}', author=popular)
+        expected = list(Post.objects.filter(
+            author__in=[self.author, popular]).order_by('-pub_date', '-pk'))
+        feed = timeline.Feed(self.reader)
+        self.assertEqual(feed.count(), len(expected))
+        self.assertEqual(list(Paginator(feed, 2).page(2)), expected[2:4])
+        paginator = FeedCursorPaginator(feed, 2)
+        page = paginator.page()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor())
+            seen += page
+        self.assertEqual(seen, expected)
+        previous = paginator.page(page.previous_cursor())
+        self.assertEqual(list(previous), expected[-3:-1])
+
+    def test_backfill_command(self):
+        """Команда backfill_timeline восстанавливает ленты"""
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        self.assertEqual(self.feed_texts(), [])
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertEqual(self.feed_texts(), [self.old_post.text])
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_backfill_takes_latest_posts_of_each_author(self):
+        """Пересборка переносит в ленту только последние посты автора"""
+        for i in range(2):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        timeline.rebuild_many([self.reader.pk])
+        self.assertEqual(self.feed_texts(), ['Пост 1', 'Пост 0'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, TIMELINE_BACKFILL_LIMIT=2)
+    def test_pulled_author_counts_like_fanned_out(self):
+        """От «тяжёлого» автора в ленте столько же последних постов,
+        сколько переносит подписка на обычного
+        """
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        self.follow()
+        fanned_out = self.feed_texts()
+        self.assertEqual(fanned_out, ['Пост 2', 'Пост 1'])
+        Follow.objects.create(user=self.stranger, author=self.author)
+        self.assertTrue(timeline.is_pull_author(self.author.pk))
+        feed = timeline.Feed(self.reader)
+        self.assertEqual(feed.count(), 2)
+        self.assertEqual(self.feed_texts(), fanned_out)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, TASKS_EAGER=False)
+    def test_posts_are_backfilled_when_author_leaves_pull_mode(self):
+        """Посты, вышедшие, пока автор был «тяжёлым», попадают в ленты,
+        когда подписчиков снова становится меньше порога
+        """
+        self.follow()
+        Follow.objects.create(user=self.stranger, author=self.author)
+        Post.objects.create(text='Пост «тяжёлого» автора', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__text='Пост «тяжёлого» автора').exists())
+        Follow.objects.get(user=self.stranger).delete()
+        self.assertEqual(tasks.work(once=True), 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post__text='Пост «тяжёлого» автора').exists())
+        self.assertEqual(
+            self.feed_texts(), ['Пост «тяжёлого» автора', self.old_post.text])
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.conf import settings
 
@@ -189,6 +192,81 @@ class PostPagesPaginatorTest(TestCase):
         )
 
 
+class PostPagesCursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.COUNT_TEST_PAGES = 13
+        cls.user = User.objects.create_user(username='NoName_3')
+        cls.group = Group.objects.create(
+            title='Тестовая группа_3',
+            slug='Test_slug_3',
+            description='Тестовое описание_3',
+        )
+        Post.objects.bulk_create([
+            Post(text=f'Тестовый пост {i}', author=cls.user, group=cls.group)
+            for i in range(cls.COUNT_TEST_PAGES)
+        ])
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(PostPagesCursorPaginatorTest.user)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.user.username
+            }),
+        )
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.author_client.get(f'{url}?cursor=').context.get(
+                    'page_obj')
+                self.assertTrue(first.is_cursor)
+                self.assertFalse(first.has_previous())
+                self.assertTrue(first.has_next())
+                self.assertEqual(
+                    len(first.object_list), settings.COUNT_OF_SHOWED_POSTS)
+
+                second = self.author_client.get(
+                    f'{url}?cursor={first.next_cursor()}'
+                ).context.get('page_obj')
+                self.assertEqual(
+                    len(second.object_list),
+                    self.COUNT_TEST_PAGES % settings.COUNT_OF_SHOWED_POSTS
+                )
+                self.assertFalse(second.has_next())
+                self.assertFalse(
+                    set(first.object_list) & set(second.object_list))
+
+                back = self.author_client.get(
+                    f'{url}?cursor={second.previous_cursor()}'
+                ).context.get('page_obj')
+                self.assertEqual(back.object_list, first.object_list)
+                self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор отдаёт первую страницу"""
+        response = self.author_client.get(
+            f"{reverse('posts:index')}?cursor=not-a-cursor")
+        page_obj = response.context.get('page_obj')
+        self.assertTrue(page_obj.is_cursor)
+        self.assertFalse(page_obj.has_previous())
+
+    def test_page_number_still_works_in_cursor_mode(self):
+        """В режиме курсоров ?page= продолжает работать"""
+        with self.settings(PAGINATION_MODE='cursor'):
+            response = self.author_client.get(reverse('posts:index'))
+            self.assertTrue(response.context.get('page_obj').is_cursor)
+            response = self.author_client.get(
+                f"{reverse('posts:index')}?page=2")
+        self.assertEqual(
+            response.context.get('page_obj').number, 2)
+
+
 class CommentsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -234,6 +312,51 @@ class CommentsTest(TestCase):
         )
 
 
+class CommentsCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Commenter')
+        cls.group = Group.objects.create(
+            title='Группа с комментариями',
+            slug='comments_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Пост с комментариями', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug})
+
+    def test_comments_count_follows_comments(self):
+        """Счётчик комментариев поста меняется вместе с комментариями"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertContains(self.client.get(self.url), 'Комментариев: 1')
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_feed_queries_do_not_depend_on_posts(self):
+        """Число запросов ленты не растёт с числом постов на странице"""
+        with CaptureQueriesContext(connection) as one_post:
+            self.client.get(self.url)
+        for i in range(settings.COUNT_OF_SHOWED_POSTS):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=self.user, group=self.group)
+            Comment.objects.create(
+                post=post, author=self.user, text='Комментарий')
+        cache.clear()
+        with CaptureQueriesContext(connection) as full_page:
+            self.client.get(self.url)
+        self.assertEqual(len(full_page), len(one_post))
+
+
 class FollowTest(TestCase):
     @classmethod
     def setUpClass(cls):
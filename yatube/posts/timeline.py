@@ -0,0 +1,254 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.functional import cached_property
+
+from core import tasks
+from . import stats
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginator import NEXT
+
+
+def is_pull_author(author_id):
+    """Посты авторов с очень большим числом подписчиков не раскладываются
+    по лентам, а подмешиваются при чтении.
+    """
+    return stats.followers_count(author_id) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def pull_author_ids(user):
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def latest_posts(author_id):
+    """Последние TIMELINE_BACKFILL_LIMIT постов автора: столько же
+    переносит в ленту подписка на обычного автора.
+    """
+    posts = Post.objects.filter(author_id=author_id)
+    limit = settings.TIMELINE_BACKFILL_LIMIT
+    if limit <= 0:
+        return posts.none()
+    oldest = list(posts.order_by('-pub_date', '-pk').values_list(
+        'pub_date', 'pk')[limit - 1:limit])
+    if not oldest:
+        return posts
+    pub_date, pk = oldest[0]
+    return posts.filter(pub_date__gte=pub_date).exclude(
+        pub_date=pub_date, pk__lt=pk)
+
+
+def _bulk_insert(entries):
+    # Django 2.2 не ограничивает явный batch_size возможностями базы:
+    # SQLite не примет больше 999 параметров в одном запросе.
+    fields = ['user_id', 'post_id', 'pub_date']
+    batch_size = min(
+        settings.TIMELINE_BATCH_SIZE,
+        connection.ops.bulk_batch_size(fields, entries) or len(entries),
+    )
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=max(batch_size, 1),
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator(
+        chunk_size=settings.TIMELINE_BATCH_SIZE)
+    batch = []
+    for user_id in followers:
+        batch.append(TimelineEntry(
+            user_id=user_id, post_id=post.pk, pub_date=post.pub_date))
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    _bulk_insert(batch)
+
+
+def _insert_latest(author_id, user_ids):
+    """Добавляет последние TIMELINE_BACKFILL_LIMIT постов автора в ленты
+    user_ids одним INSERT ... SELECT; уже разложенные посты пропускаются.
+    """
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    post_table = Post._meta.db_table
+    sql = f"""
+        {connection.ops.insert_statement(ignore_conflicts=True)}
+        {TimelineEntry._meta.db_table} (user_id, post_id, pub_date)
+        SELECT follow.user_id, latest.id, latest.pub_date
+        FROM {Follow._meta.db_table} follow
+        CROSS JOIN (
+            SELECT id, pub_date FROM {post_table}
+            WHERE author_id = %s
+            ORDER BY pub_date DESC, id DESC
+            LIMIT %s
+        ) latest
+        WHERE follow.author_id = %s AND follow.user_id IN ({placeholders})
+        {connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            author_id, settings.TIMELINE_BACKFILL_LIMIT, author_id, *user_ids,
+        ])
+
+
+def add_author(user_id, author_id):
+    if is_pull_author(author_id):
+        return
+    _insert_latest(author_id, [user_id])
+
+
+def check_fanout(author_id):
+    """Вызывается после отписки: если автор только что перестал быть
+    «тяжёлым», его посты снова нужно раскладывать по лентам.
+    """
+    if stats.followers_count(author_id) == settings.TIMELINE_FANOUT_LIMIT:
+        backfill_author.enqueue(
+            author_id, dedup_key=f'timeline-backfill:{author_id}')
+
+
+@tasks.task(priority=tasks.LOW)
+def backfill_author(author_id):
+    """Переносит в ленты подписчиков последние посты автора, который
+    вышел из режима «тяжёлых»: пока его посты подмешивались при чтении,
+    в ленты они не попадали.
+    """
+    if is_pull_author(author_id):
+        return
+    user_ids = list(Follow.objects.filter(author_id=author_id).order_by(
+        'user_id').values_list('user_id', flat=True))
+    # Не больше TIMELINE_BATCH_SIZE строк в одной транзакции.
+    step = max(
+        settings.TIMELINE_BATCH_SIZE
+        // max(settings.TIMELINE_BACKFILL_LIMIT, 1), 1)
+    for i in range(0, len(user_ids), step):
+        with transaction.atomic():
+            _insert_latest(author_id, user_ids[i:i + step])
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild_many(user_ids, limit=None):
+    """Пересобирает ленты пачки пользователей одним INSERT ... SELECT.
+
+    Последние limit (по умолчанию TIMELINE_BACKFILL_LIMIT) постов каждой
+    подписки выбирает коррелированный подзапрос с LIMIT по индексу
+    (author, pub_date), так что стоимость не зависит от числа старых
+    постов автора. Строк получается до limit на каждую подписку: при
+    сотнях подписок на пользователя это сотни тысяч строк, поэтому
+    seed_yatube позволяет уменьшить limit.
+    """
+    if not user_ids:
+        return
+    if limit is None:
+        limit = settings.TIMELINE_BACKFILL_LIMIT
+    TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    post_table = Post._meta.db_table
+    sql = f"""
+        INSERT INTO {TimelineEntry._meta.db_table} (user_id, post_id, pub_date)
+        SELECT follow.user_id, post.id, post.pub_date
+        FROM {Follow._meta.db_table} follow
+        LEFT JOIN {AuthorStats._meta.db_table} stats
+            ON stats.author_id = follow.author_id
+        JOIN {post_table} post ON post.id IN (
+            SELECT latest.id FROM {post_table} latest
+            WHERE latest.author_id = follow.author_id
+            ORDER BY latest.pub_date DESC, latest.id DESC
+            LIMIT %s
+        )
+        WHERE follow.user_id IN ({placeholders})
+            AND COALESCE(stats.followers_count, 0) <= %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            limit,
+            *user_ids,
+            settings.TIMELINE_FANOUT_LIMIT,
+        ])
+
+
+class Feed:
+    """Лента подписок: материализованная лента пользователя плюс посты
+    «тяжёлых» авторов, читаемые напрямую. От «тяжёлого» автора, как и от
+    обычного при подписке, берутся последние TIMELINE_BACKFILL_LIMIT
+    постов, так что число постов ленты не зависит от режима автора.
+
+    Каждый источник читается диапазоном своего индекса — (user,
+    pub_date, post) у записей ленты и (author, pub_date) у постов
+    каждого «тяжёлого» автора — не дальше нужного числа строк. Ключи
+    (pub_date, id) сливаются, а посты страницы выбираются по id из
+    queryset. Объект годится как object_list для Paginator (count() и
+    срезы) и для FeedCursorPaginator (fetch()).
+    """
+
+    def __init__(self, user, queryset=None):
+        self.user = user
+        self.queryset = Post.objects.all() if queryset is None else queryset
+        self.pulled = pull_author_ids(user)
+
+    @cached_property
+    def pulled_posts(self):
+        return [latest_posts(author_id) for author_id in self.pulled]
+
+    def sources(self):
+        """Пары (QuerySet, поле id поста) с полем pub_date."""
+        entries = TimelineEntry.objects.filter(user=self.user)
+        if self.pulled:
+            # Записи, разложенные, пока автор ещё не был «тяжёлым».
+            entries = entries.exclude(post__author_id__in=self.pulled)
+        return [(entries, 'post_id')] + [
+            (posts, 'pk') for posts in self.pulled_posts
+        ]
+
+    def keys(self, direction, key, limit, offset=0):
+        """Ключи (pub_date, id) постов после key в направлении direction,
+        начиная со смещения offset.
+        """
+        sources = self.sources()
+        descending = direction == NEXT
+        result = []
+        for queryset, pk_field in sources:
+            if key is not None:
+                pub_date, pk = key
+                bound = 'lte' if descending else 'gte'
+                passed = 'gte' if descending else 'lte'
+                queryset = queryset.filter(**{
+                    f'pub_date__{bound}': pub_date,
+                }).exclude(**{
+                    'pub_date': pub_date,
+                    f'{pk_field}__{passed}': pk,
+                })
+            ordering = (
+                ('-pub_date', f'-{pk_field}') if descending
+                else ('pub_date', pk_field)
+            )
+            rows = queryset.order_by(*ordering).values_list(
+                'pub_date', pk_field)
+            if len(sources) == 1:
+                return list(rows[offset:offset + limit])
+            result += rows[:offset + limit]
+        return sorted(result, reverse=descending)[offset:offset + limit]
+
+    def posts(self, keys):
+        posts = self.queryset.in_bulk([pk for _, pk in keys])
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+    def fetch(self, direction, key, limit):
+        return self.posts(self.keys(direction, key, limit))
+
+    def count(self):
+        return sum(queryset.count() for queryset, _ in self.sources())
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        return self.posts(self.keys(NEXT, None, stop - start, start))
@@ -0,0 +1,68 @@
+"""Версии лент и постов для ключей кеша фрагментов и ETag.
+
+Версия входит в ключ {% cache %} и меняется сигналами при изменении
+постов, групп, комментариев и подписок, поэтому фрагменты можно хранить
+долго. Версия — время последнего изменения в наносекундах: она служит
+и для Last-Modified, и, если ключ версии вытеснен из кеша, новая версия
+не совпадёт ни с одной из старых.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = 'posts:version'
+
+
+def feed_version_key(group_id=None, author_id=None):
+    if group_id is not None:
+        return f'{VERSION_KEY_PREFIX}:group:{group_id}'
+    if author_id is not None:
+        return f'{VERSION_KEY_PREFIX}:author:{author_id}'
+    return f'{VERSION_KEY_PREFIX}:all'
+
+
+def post_version_key(post_id):
+    return f'{VERSION_KEY_PREFIX}:post:{post_id}'
+
+
+def profile_version_key(author_id):
+    """Версия шапки профиля: числа подписчиков и подписок."""
+    return f'{VERSION_KEY_PREFIX}:profile:{author_id}'
+
+
+def post_version_keys(author_id, group_id):
+    """Ключи версий всех лент, в которых показывается пост."""
+    keys = [feed_version_key(), feed_version_key(author_id=author_id)]
+    if group_id is not None:
+        keys.append(feed_version_key(group_id=group_id))
+    return keys
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(keys):
+    """Версии нескольких ключей одним обращением к кешу."""
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found else get_version(key) for key in keys
+    ]
+
+
+def bump(keys):
+    now = time.time_ns()
+    found = cache.get_many(keys)
+    # Версия растёт даже при нескольких изменениях в одну наносекунду.
+    cache.set_many(
+        {key: max(now, found.get(key, 0) + 1) for key in keys}, None)
+
+
+def as_datetime(version):
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
@@ -4,30 +4,41 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
 
 
+from . import conditional, search as full_text, stats, timeline, versions
+from .counters import feed_count_key
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginator import (
+    CachedCountPaginator, CursorPaginator, FeedCursorPaginator,
+)
+from .versions import feed_version_key
 
 
+@conditional.conditional_page(conditional.index_keys)
 def index(request):
     context = paginator_page(Post.objects.select_related(
         'author',
-        'group'), request)
-
+        'group'), request, feed_count_key())
+    context.update(feed_cache(feed_version_key()))
     return render(request, 'posts/index.html', context)
 
 
+@conditional.conditional_page(conditional.group_keys)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
     }
     context.update(paginator_page(group.posts.select_related(
-        'author'), request))
+        'author'), request, feed_count_key(group_id=group.pk)))
+    context.update(feed_cache(feed_version_key(group_id=group.pk)))
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional.conditional_page(conditional.profile_keys)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     user = request.user
     following = (
         request.user.is_authenticated and Follow.objects.filter(
@@ -35,34 +46,83 @@ def profile(request, username):
     )
     context = {
         'author': author,
+        'author_stats': stats.get_stats(author),
         'following': following
     }
     context.update(paginator_page(author.posts.select_related(
-        'group'), request))
+        'group'), request, feed_count_key(author_id=author.pk)))
+    context.update(feed_cache(feed_version_key(author_id=author.pk)))
     return render(request, 'posts/profile.html', context)
 
 
-def paginator_page(queryset, request):
-    paginator = Paginator(queryset, settings.COUNT_OF_SHOWED_POSTS)
+def paginator_page(queryset, request, count_key=None,
+                   cursor_paginator=CursorPaginator):
+    cursor = request.GET.get('cursor')
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if cursor is not None or (
+        settings.PAGINATION_MODE == 'cursor' and page_number is None
+    ):
+        paginator = cursor_paginator(
+            queryset, settings.COUNT_OF_SHOWED_POSTS)
+        page_obj = paginator.get_page(cursor)
+    elif count_key is not None:
+        paginator = CachedCountPaginator(
+            queryset, settings.COUNT_OF_SHOWED_POSTS, count_key)
+        page_obj = paginator.get_page(page_number)
+    else:
+        paginator = Paginator(queryset, settings.COUNT_OF_SHOWED_POSTS)
+        page_obj = paginator.get_page(page_number)
     return {
         'page_obj': page_obj,
     }
 
 
+def feed_cache(version_key=None):
+    """Время жизни кеша карточек и, если задан ключ, версия ленты для
+    {% cache %} её постов.
+    """
+    context = {'card_cache_timeout': settings.CARD_CACHE_TIMEOUT}
+    if version_key is not None:
+        context.update({
+            'feed_version': versions.get_version(version_key),
+            'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        })
+    return context
+
+
+@conditional.conditional_page(conditional.post_keys)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     form = CommentForm()
-    comments = post.comments.select_related('author')
+    comments = post.comments.select_related('author').order_by('created')
     context = {
         'post': post,
+        'author_stats': stats.get_stats(post.author),
         'form': form,
         'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page_obj = full_text.search(
+            query, settings.COUNT_OF_SHOWED_POSTS, request.GET.get('cursor'),
+            Post.objects.select_related('author', 'group'))
+    except full_text.InvalidCursor:
+        page_obj = full_text.search(
+            query, settings.COUNT_OF_SHOWED_POSTS,
+            queryset=Post.objects.select_related('author', 'group'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    context.update(feed_cache())
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -110,8 +170,10 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    context = paginator_page(Post.objects.filter(
-        author__following__user=request.user), request)
+    context = paginator_page(timeline.Feed(
+        request.user, Post.objects.select_related('author', 'group'),
+    ), request, cursor_paginator=FeedCursorPaginator)
+    context.update(feed_cache())
     return render(request, 'posts/follow.html', context)
 
 
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,7 +65,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -146,13 +147,127 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Variables
 COUNT_OF_SHOWED_POSTS: int = 10
+# 'page' — номера страниц (?page=), 'cursor' — keyset-курсоры (?cursor=)
+PAGINATION_MODE: str = 'page'
+# Счётчики постов в лентах: время жизни в кеше и порог числа строк,
+# начиная с которого общая лента использует оценку вместо COUNT(*)
+POSTS_COUNT_CACHE_TIMEOUT: int = 60 * 60
+POSTS_COUNT_ESTIMATE_THRESHOLD: int = 1_000_000
+# Лента подписок: авторы с числом подписчиков больше лимита читаются
+# напрямую, а не раскладываются по лентам подписчиков
+TIMELINE_FANOUT_LIMIT: int = 10_000
+TIMELINE_BACKFILL_LIMIT: int = 1_000
+TIMELINE_BATCH_SIZE: int = 1_000
+# Фрагменты лент в кеше сбрасываются сигналами через версию в ключе,
+# поэтому могут храниться долго
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 6
+# Карточка поста кешируется по id и дате изменения поста
+CARD_CACHE_TIMEOUT: int = 60 * 60 * 24
 SYMBOL_LIMIT: int = 15
 
+# Сессии читаются через кеш и пишутся в базу, только когда меняются
+# (core.sessions); истёкшие удаляются частями периодической задачей
+SESSION_ENGINE = 'core.sessions'
+SESSION_EXPIRY_REFRESH_INTERVAL: int = 60 * 60 * 24
+SESSION_CLEANUP_BATCH_SIZE: int = 1000
+
 # Variable for CSRF token
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Общий для всех процессов кеш в файле SQLite (WAL): фрагменты страниц,
+# счётчики и версии одинаковы во всех воркерах без отдельного сервера
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+        },
     }
 }
+# manage.py test и команды замеров работают со своим временным файлом
+# кеша (core.testing), не затрагивая общий кеш хоста
+TEST_RUNNER = 'core.testing.DiscoverRunner'
+
+# Картинки постов хранятся по хешу содержимого (core.storage) в
+# MEDIA_SHARD_DEPTH уровнях вложенных каталогов. Неиспользуемый файл
+# удаляется (сразу или командой collect_media_garbage), если его не
+# сохраняли заново MEDIA_GRACE_PERIOD секунд
+MEDIA_SHARD_DEPTH: int = 2
+MEDIA_GRACE_PERIOD: int = 60 * 60
+
+# Загрузки всегда пишутся на диск кусками; файлы больше лимита
+# отклоняются формой без чтения в память
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedTemporaryFileUploadHandler']
+FILE_UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024
+# Картинка проверяется по заголовку до декодирования; оригиналы больше
+# IMAGE_MAX_SIDE по большей стороне уменьшаются в пуле миниатюр
+IMAGE_UPLOAD_MAX_PIXELS: int = 40_000_000
+IMAGE_MAX_SIDE: int = 2560
+
+THUMBNAIL_BACKEND = 'core.backends.ThumbnailBackend'
+# Миниатюры создаются заранее в пуле процессов: адаптивные варианты
+# ({% responsive_image %}) и геометрии из THUMBNAIL_GEOMETRIES, которые
+# нужны тегу {% thumbnail %} в шаблонах
+THUMBNAIL_GEOMETRIES = []
+# Адаптивные варианты: ширины, соотношение сторон и форматы в порядке
+# предпочтения; последний — запасной для браузеров без остальных.
+# Форматы, которые не поддерживает Pillow, пропускаются
+THUMBNAIL_RESPONSIVE_WIDTHS = [320, 640, 960]
+THUMBNAIL_RESPONSIVE_RATIO = (960, 339)
+THUMBNAIL_RESPONSIVE_FORMATS = ['WEBP', 'JPEG']
+THUMBNAIL_RESPONSIVE_SIZES = '(min-width: 992px) 960px, 100vw'
+# 0 — создавать миниатюры в текущем процессе сразу после сохранения,
+# иначе — задачами очереди; число процессов generate_thumbnails
+THUMBNAIL_WORKERS: int = 2
+# LRU готовых миниатюр в памяти процесса: число записей и время жизни
+THUMBNAIL_LRU_SIZE: int = 2048
+THUMBNAIL_LRU_TIMEOUT: int = 300
+
+# Очередь задач в базе (core.tasks): письма, миниатюры и фоновые задачи
+# админки выполняют процессы manage.py run_workers. Упавшая задача
+# повторяется через TASK_RETRY_DELAY * 2^(попытка - 1) секунд; воркер
+# занимает задачу на TASK_TIMEOUT секунд, после чего её может взять
+# другой. TASKS_EAGER — выполнять задачи в текущем процессе сразу после
+# фиксации транзакции, без воркеров
+TASKS_EAGER: bool = False
+TASK_WORKERS: int = 2
+TASK_MAX_ATTEMPTS: int = 5
+TASK_TIMEOUT: int = 5 * 60
+TASK_RETRY_DELAY: int = 10
+TASK_POLL_INTERVAL: float = 1.0
+# Периодические задачи: имя функции и интервал в секундах
+TASK_PERIODIC = {
+    'core.sessions.clear_expired': 60 * 60,
+}
+
+# Массовые удаления и перенос постов из админки выполняются в воркерах
+# очереди фоновыми задачами (posts.jobs) частями по BULK_JOB_BATCH_SIZE
+# объектов с паузой между частями. Задача, которую не продлевали
+# BULK_JOB_LEASE секунд, считается брошенной, и её продолжает
+# run_bulk_jobs
+BULK_JOB_BATCH_SIZE: int = 200
+BULK_JOB_PAUSE: float = 0.05
+BULK_JOB_LEASE: int = 60
+
+# Server-Timing: время SQL, шаблонов, кеша и миниатюр в каждом ответе и
+# строка в логе yatube.timing; запросы дольше порога — с уровнем WARNING
+SERVER_TIMING: bool = True
+SERVER_TIMING_LOG_THRESHOLD_MS: int = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}